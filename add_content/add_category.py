@@ -60,6 +60,8 @@ class AddCategoryWindow(QWidget):
         else:
             os.makedirs(os.path.join("assets", new_category_name, "audio"))
             self.write_phrases(new_category_name, {"syntax":[]})
+            # adds the category to the menus now rather than at the next poll
+            self.main_window.reset_config()
         feedback.exec()
 
     def load_phrases(self, category: str) -> dict:
@@ -1,10 +1,12 @@
-import json
-import os
+from concurrent.futures import Future
+
 from PyQt5.QtWidgets import (QMainWindow,
                              QLabel, QTextEdit, QPushButton,
                              QWidget, QVBoxLayout,
                              QAction, QMessageBox, QApplication)
 
+from add_content.phrase_index import phrase_index
+
 
 class AddPhraseWindow(QWidget):
     """
@@ -55,44 +57,46 @@ class AddPhraseWindow(QWidget):
       w.close()
 
     def on_submit(self) -> None:
-        skip = False
         feedback = QMessageBox()
 
-        syntax = self.load_phrases(self.category)
         mother_tongue_phrases = self.input_box_1.toPlainText().split("*")
         new_language_phrases = self.input_box_2.toPlainText().split("*")
 
         if len(mother_tongue_phrases) != len(new_language_phrases):
             feedback.setText("please enter the same number of phrases in each box")
+            feedback.exec()
+            return
         elif mother_tongue_phrases[0] == "" and len(mother_tongue_phrases) == 1:
             feedback.setText("Please enter some text before submitting")
+            feedback.exec()
+            return
 
-        for mt, nl in zip(mother_tongue_phrases, new_language_phrases):
-            # check if phrase already present in app, if it is skip adding it to the syntax
-            for mt_nl in syntax["syntax"]:
-                if self.main_window.preprocess(mt) == mt_nl[0] or self.main_window.preprocess(nl) == mt_nl[0]:
-                    skip = True
-            if skip:
-                skip = False
-                continue
-            else:
-                syntax["syntax"].append([self.main_window.preprocess(mt), self.main_window.preprocess(nl)])
+        # reading the category and appending to its journal happen on a disk task thread
+        self.main_window.disk_tasks.submit(self.add_phrases, mother_tongue_phrases, new_language_phrases,
+                                           on_done=lambda future: self.on_added(len(mother_tongue_phrases), future))
 
-        self.write_phrases(self.category, syntax)
+    def add_phrases(self, mother_tongue_phrases: list, new_language_phrases: list) -> int:
+        """
+        adds the phrase pairs to the category, returns the number added
+        """
+        index = phrase_index(self.category, self.main_window.preprocess)
+        added = index.add_new_phrases(mother_tongue_phrases, new_language_phrases)
+        index.save()
+        return added
+
+    def on_added(self, submitted: int, future: Future):
+        feedback = QMessageBox()
+        try:
+            added = future.result()
+        except (OSError, ValueError) as e:
+            feedback.setText(f"couldnt add phrases to {self.category}: {str(e)}")
+            feedback.exec()
+            return
         self.input_box_1.clear()
         self.input_box_2.clear()
-        feedback.setText(f"you have successfully added to the category: {self.category}")
+        skipped = submitted - added
+        message = f"you have successfully added to the category: {self.category}"
+        if skipped:
+            message += f", {skipped} phrase(s) were already in it and were skipped"
+        feedback.setText(message)
         feedback.exec()
-
-    def load_phrases(self, category: str) -> dict:
-        path = os.path.join("assets", category, "phrases.json")
-
-        with open(path, "r") as f:
-            syntax = json.load(f)
-        return syntax
-
-    def write_phrases(self, category: str, syntax: dict) -> list:
-        path = os.path.join("assets", category, "phrases.json")
-
-        with open(path, "w") as f:
-            json.dump(syntax, f, indent=4)
\ No newline at end of file
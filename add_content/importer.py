@@ -0,0 +1,216 @@
+"""
+Streams phrase pairs from TSV/CSV files or Anki text exports into a category,
+creating the category if it doesn't exist. Run from the repository root with:
+    python add_content/importer.py deck.txt spanish
+Rows are read, normalised and deduplicated one at a time against 64 bit hashes
+of the phrases seen, and phrases.json is written in one pass with any phrases
+waiting in the category's journal folded in. The category's existing phrases and
+weights are read into memory whole, so memory is bounded by the existing category
+plus the hashes of the imported phrases, not by the size of the imported file.
+"""
+import argparse
+import csv
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import time
+from itertools import chain
+from typing import Callable, Iterable, Iterator, Tuple
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from persistence import write_json_atomic
+from phrase_journal import phrase_journal, phrases_path, write_phrases
+
+FORMATS = ["tsv", "csv", "anki"]
+HTML_TAG = re.compile(r"<[^>]+>")
+# values of the #separator header of Anki exports
+ANKI_SEPARATORS = {"tab": "\t", "comma": ",", "semicolon": ";", "pipe": "|", "space": " ",
+                   "colon": ":"}
+
+
+def detect_format(path: str) -> str:
+    """
+    returns format of file at path from its extension or, failing that, its first line
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in [".csv", ".tsv"]:
+        return extension[1:]
+    with open(path, "r", encoding="utf-8-sig") as f:
+        first_line = f.readline()
+    if first_line.startswith("#"):
+        return "anki"
+    return "tsv" if "\t" in first_line else "csv"
+
+
+def read_rows(path: str, format: str = None, columns: Tuple[int, int] = (0, 1)) -> Iterator[Tuple[str, str]]:
+    """
+    Yields (known language, new language) pairs from file at path, one row at a time
+    Parameters
+    ----------
+    path: file to read
+    format: one of FORMATS, detected from the file if not given
+    columns: indices of the known language and new language fields in each row
+    """
+    format = format or detect_format(path)
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        lines = iter(f)
+        delimiter, quoting, strip_html = {"tsv": ("\t", csv.QUOTE_NONE, False),
+                                          "csv": (",", csv.QUOTE_MINIMAL, False),
+                                          "anki": ("\t", csv.QUOTE_MINIMAL, True)}[format]
+        if format == "anki":
+            # exports start with lines like #separator:tab and #html:true
+            for line in lines:
+                if not line.startswith("#"):
+                    lines = chain([line], lines)
+                    break
+                key, _, value = line[1:].strip().partition(":")
+                if key == "separator":
+                    delimiter = ANKI_SEPARATORS.get(value.lower(), value[:1] or delimiter)
+                elif key == "html":
+                    strip_html = value.lower() == "true"
+
+        for row in csv.reader(lines, delimiter=delimiter, quoting=quoting):
+            if len(row) <= max(columns):
+                continue
+            known, new = row[columns[0]], row[columns[1]]
+            if strip_html:
+                known = html.unescape(HTML_TAG.sub("", known))
+                new = html.unescape(HTML_TAG.sub("", new))
+            yield known, new
+
+
+def valid_category_name(category: str) -> bool:
+    """
+    returns True if category names a single folder directly inside assets
+    """
+    separators = [sep for sep in (os.sep, os.altsep, "/") if sep]
+    return (category.strip() not in ("", ".", "..")
+            and not os.path.isabs(category)
+            and not os.path.splitdrive(category)[0]
+            and not any(sep in category for sep in separators)
+            and "\0" not in category)
+
+
+def phrase_hash(phrase: str) -> int:
+    return int.from_bytes(hashlib.blake2b(phrase.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class ImportReport:
+    """
+    Counts of an import
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.added = 0
+        self.duplicates = 0
+        self.empty = 0
+        self.seconds = 0.0
+
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (f"{self.rows} rows in {self.seconds:.1f}s ({self.rows_per_second():.0f} rows/s), "
+                f"added {self.added}, skipped {self.duplicates} duplicates and {self.empty} empty rows")
+
+
+def import_phrases(rows: Iterable[Tuple[str, str]],
+                   category: str,
+                   preprocess: Callable[[str], str],
+                   report_every: int = 100000,
+                   progress: Callable[[str], None] = print) -> ImportReport:
+    """
+    Appends rows to category, skipping pairs whose known or new phrase is
+    already in the category, and extends its weights.json to match, rows
+    are streamed but the existing phrases and weights are loaded whole
+    Parameters
+    ----------
+    rows: (known language, new language) pairs, e.g. from read_rows
+    category: name of the category, created if it doesn't exist
+    preprocess: function normalising phrases, as Game.preprocess
+    report_every: rows between progress messages
+    progress: called with progress messages
+    """
+    report = ImportReport()
+    start = time.perf_counter()
+    folder = os.path.join("assets", category)
+    os.makedirs(os.path.join(folder, "audio"), exist_ok=True)
+    journal = phrase_journal(category)
+
+    with journal.exclusive():
+        existing, deleted, sequence = [], set(), 0
+        if os.path.exists(phrases_path(category)):
+            existing, deleted = journal.read()
+            sequence = journal.sequence
+        # deleted phrases may be imported again
+        known, new = set(), set()
+        for i, pair in enumerate(existing):
+            if i not in deleted:
+                known.add(phrase_hash(preprocess(pair[0])))
+                new.add(phrase_hash(preprocess(pair[1])))
+
+        def new_pairs():
+            for mother_tongue, new_language in rows:
+                report.rows += 1
+                if report.rows % report_every == 0:
+                    report.seconds = time.perf_counter() - start
+                    progress(str(report))
+                mother_tongue, new_language = preprocess(mother_tongue), preprocess(new_language)
+                if not mother_tongue or not new_language:
+                    report.empty += 1
+                    continue
+                known_hash, new_hash = phrase_hash(mother_tongue), phrase_hash(new_language)
+                if known_hash in known or new_hash in new:
+                    report.duplicates += 1
+                    continue
+                known.add(known_hash)
+                new.add(new_hash)
+                report.added += 1
+                yield [mother_tongue, new_language]
+
+        # the journal is folded into the new phrases.json
+        write_phrases(phrases_path(category), chain(existing, new_pairs()), deleted, sequence)
+        journal.discard(sequence)
+
+    weights_path = os.path.join(folder, "weights.json")
+    if report.added and os.path.exists(weights_path):
+        with open(weights_path, "r") as f:
+            weights = json.load(f)["weights"]
+        # weights that don't match the old phrases are reset by the game anyway
+        if len(weights) == len(existing):
+            write_json_atomic(weights_path, {"weights": weights + report.added * [1]})
+
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def main():
+    from config import Config
+    from normalizer import Normalizer
+
+    parser = argparse.ArgumentParser(description="import phrase pairs into a category")
+    parser.add_argument("path", help="TSV, CSV or Anki text export to read")
+    parser.add_argument("category", help="category to add the phrases to, created if needed")
+    parser.add_argument("--format", choices=FORMATS, default=None, help="detected from the file if not given")
+    parser.add_argument("--columns", default="0,1",
+                        help="indices of the known language and new language fields, e.g. 1,0 to swap them")
+    parser.add_argument("--report-every", type=int, default=100000, help="rows between progress reports")
+    args = parser.parse_args()
+    if not valid_category_name(args.category):
+        parser.error(f"invalid category name {args.category!r}, it can't be empty, '.', '..' or contain a path separator")
+
+    columns = tuple(int(c) for c in args.columns.split(","))
+    normalizer = Normalizer(Config("config.json").params)
+    report = import_phrases(read_rows(args.path, args.format, columns), args.category,
+                            normalizer.preprocess, args.report_every)
+    print(f"imported into {args.category}: {report}")
+
+
+if __name__ == "__main__":
+    main()
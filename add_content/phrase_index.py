@@ -0,0 +1,99 @@
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from phrase_journal import journal_path, phrase_journal, phrases_path
+
+
+def file_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class PhraseIndex:
+    """
+    A category's phrases held in memory with a set of the preprocessed phrases
+    of each column, so checking a new pair for duplicates costs two set
+    lookups instead of a scan of every phrase in the category
+    """
+
+    def __init__(self, category: str, preprocess: Callable[[str], str]):
+        """
+        Parameters
+        ----------
+        category: name of the category
+        preprocess: function normalising phrases before they are compared and stored
+        """
+        self.category = category
+        self.preprocess = preprocess
+        self.journal = phrase_journal(category)
+        # pairs added but not saved yet
+        self.unsaved = []
+        self.load()
+
+    def load(self):
+        self.syntax, deleted = self.journal.read()
+        self.mtime = self.files_mtime()
+        # deleted phrases may be added again
+        live = [p for i, p in enumerate(self.syntax) if i not in deleted]
+        self.known = {self.preprocess(p[0]) for p in live}
+        self.new = {self.preprocess(p[1]) for p in live}
+
+    def files_mtime(self) -> Tuple[Optional[int], Optional[int]]:
+        return file_mtime(phrases_path(self.category)), file_mtime(journal_path(self.category))
+
+    def is_current(self) -> bool:
+        """
+        returns False if the category's phrases have been changed by something other than this index
+        """
+        return self.files_mtime() == self.mtime
+
+    def contains(self, mother_tongue: str, new_language: str) -> bool:
+        """
+        returns True if either phrase of the pair is already in its column
+        """
+        return self.preprocess(mother_tongue) in self.known or self.preprocess(new_language) in self.new
+
+    def add_new_phrases(self, mother_tongue_phrases: List[str], new_language_phrases: List[str]) -> int:
+        """
+        Appends preprocessed phrase pairs to the category, skipping pairs already
+        present, including pairs repeated within the phrases being added
+        Returns
+        -------
+        number of pairs added
+        """
+        added = 0
+        for mt, nl in zip(mother_tongue_phrases, new_language_phrases):
+            mt, nl = self.preprocess(mt), self.preprocess(nl)
+            if mt in self.known or nl in self.new:
+                continue
+            self.syntax.append([mt, nl])
+            self.unsaved.append([mt, nl])
+            self.known.add(mt)
+            self.new.add(nl)
+            added += 1
+        return added
+
+    def save(self):
+        """
+        appends the added pairs to the category's journal
+        """
+        self.journal.add(self.unsaved)
+        self.unsaved = []
+        self.mtime = self.files_mtime()
+
+
+# category -> index, shared by every AddPhraseWindow
+INDEXES: Dict[str, PhraseIndex] = {}
+
+
+def phrase_index(category: str, preprocess: Callable[[str], str]) -> PhraseIndex:
+    """
+    returns the index of category, reading its phrases only the first time or if they have changed since
+    """
+    index = INDEXES.get(category)
+    if index is None or index.preprocess != preprocess or not index.is_current():
+        index = PhraseIndex(category, preprocess)
+        INDEXES[category] = index
+    return index
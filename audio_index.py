@@ -0,0 +1,64 @@
+import os
+from typing import Optional
+
+
+class AudioIndex:
+    """
+    Maps phrase index to the audio file for that phrase in one category's
+    audio folder. The folder is scanned once and only scanned again when its
+    mtime changes, so a lookup costs a single stat instead of a listdir
+    """
+
+    def __init__(self, folder: str, pack=None):
+        """
+        Parameters
+        ----------
+        folder: audio folder of the category
+        pack: optional CategoryPack, its audio table is used instead of
+        scanning the folder for as long as the folder is older than the pack
+        """
+        self.folder = folder
+        self.paths = {}
+        self.mtime = None
+        self.pack = None
+        if pack is not None and pack.mtime is not None:
+            mtime = self.folder_mtime()
+            if mtime is not None and mtime <= pack.mtime:
+                self.pack = pack
+                self.mtime = mtime
+
+    def folder_mtime(self) -> Optional[int]:
+        try:
+            return os.stat(self.folder).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def refresh(self):
+        """
+        rescans the folder if it has changed since it was last scanned
+        """
+        mtime = self.folder_mtime()
+        if mtime == self.mtime:
+            return
+        paths = {}
+        if mtime is not None:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    number = entry.name.split(".")[0]
+                    if number.isdigit():
+                        paths[int(number)] = entry.path
+        self.paths = paths
+        self.pack = None
+        self.mtime = mtime
+
+    def get(self, index: int) -> Optional[str]:
+        """
+        returns path of the audio file for phrase at index, None if there isn't one
+        """
+        self.refresh()
+        path = self.paths.get(index)
+        if path is None and self.pack is not None and index < self.pack.count:
+            audio_file = self.pack.audio_file(index)
+            if audio_file is not None:
+                path = self.paths[index] = os.path.join(self.folder, audio_file)
+        return path
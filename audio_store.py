@@ -0,0 +1,266 @@
+"""
+Content addressed store of synthesised audio shared by every category, audio_store/ by default.
+A phrase's audio is kept under a hash of its normalised text, language, voice and text to
+speech backend, so the same phrase in two categories is synthesised and stored once and
+reordering phrases.json can't give a phrase another phrase's audio. Once the store grows
+past its size limit the least recently played files are removed, they are synthesised
+again if needed. Each category keeps an index, assets/<category>/audio.index, of the keys
+its phrases use, read by this script to report sharing and remove unused audio:
+    python audio_store.py stats
+    python audio_store.py gc
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from typing import Dict, Optional, Set
+
+from persistence import atomic_writer
+
+STORE_PATH = "audio_store"
+INDEX_NAME = "audio.index"
+# after an eviction the store is this fraction of its limit, so not every new file evicts
+EVICT_TO = 0.9
+
+
+def normalize_text(text: str) -> str:
+    """
+    returns text as it is hashed, differences that don't change how it is spoken are removed
+    """
+    return unicodedata.normalize("NFC", " ".join(text.split()))
+
+
+def audio_key(text: str, lang: str, voice: Optional[str], backend: str) -> str:
+    """
+    returns key of the audio of text spoken in lang by voice of backend
+    """
+    identity = json.dumps([normalize_text(text), lang, voice or "", backend], ensure_ascii=False)
+    return hashlib.blake2b(identity.encode("utf-8"), digest_size=16).hexdigest()
+
+
+class AudioStore:
+    """
+    Audio files named by key, in a sub folder per first two characters of the key,
+    get the store of a path with audio_store so every game in the process shares it
+    """
+
+    def __init__(self, root: str = STORE_PATH, max_bytes: int = 1024 * 1024 * 1024):
+        """
+        Parameters
+        ----------
+        root: folder of the store
+        max_bytes: size the store is kept under
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # path -> size, of every file in the store, scanned when first needed
+        self.sizes: Optional[Dict[str, int]] = None
+        self.bytes = 0
+
+    def path(self, key: str, extension: str, create: bool = False) -> str:
+        """
+        returns path of the audio with key, creating its folder if create
+        """
+        folder = os.path.join(self.root, key[:2])
+        if create:
+            os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, f"{key}.{extension}")
+
+    def find(self, key: str, extension: str) -> Optional[str]:
+        """
+        returns path of the audio with key, None if it isn't in the store,
+        finding it counts as a use so it is evicted later
+        """
+        path = self.path(key, extension)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def scan(self):
+        self.sizes = {}
+        self.bytes = 0
+        if not os.path.isdir(self.root):
+            return
+        with os.scandir(self.root) as folders:
+            for folder in folders:
+                if not folder.is_dir():
+                    continue
+                with os.scandir(folder.path) as entries:
+                    for entry in entries:
+                        # files still being written are hidden
+                        if entry.is_file() and not entry.name.startswith("."):
+                            size = entry.stat().st_size
+                            self.sizes[entry.path] = size
+                            self.bytes += size
+
+    def record(self, path: str):
+        """
+        Accounts for the file written to path, evicting the least recently used
+        files if the store is over its limit
+        """
+        with self.lock:
+            if self.sizes is None:
+                self.scan()
+            try:
+                size = os.stat(path).st_size
+            except FileNotFoundError:
+                return
+            self.bytes += size - self.sizes.get(path, 0)
+            self.sizes[path] = size
+            if self.bytes > self.max_bytes:
+                self.evict(int(EVICT_TO * self.max_bytes))
+
+    def evict(self, max_bytes: int):
+        """
+        removes the least recently used files until the store is under max_bytes
+        """
+        last_used = []
+        for path in self.sizes:
+            try:
+                last_used.append((os.stat(path).st_mtime_ns, path))
+            except FileNotFoundError:
+                # removed by another process
+                last_used.append((0, path))
+        last_used.sort()
+        for _, path in last_used:
+            if self.bytes <= max_bytes:
+                break
+            self.remove(path)
+
+    def remove(self, path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        self.bytes -= self.sizes.pop(path, 0)
+
+    def keys(self) -> Dict[str, str]:
+        """
+        returns key -> path of every file in the store
+        """
+        with self.lock:
+            if self.sizes is None:
+                self.scan()
+            return {os.path.basename(path).split(".")[0]: path for path in self.sizes}
+
+
+class CategoryAudio:
+    """
+    Index of the keys of a category's phrases, an append only file of
+    "<phrase index> <key>" lines where later lines replace earlier ones,
+    get it with category_audio so every game in the process shares it
+    """
+
+    def __init__(self, category: str):
+        self.category = category
+        self.path = os.path.join("assets", category, INDEX_NAME)
+        self.lock = threading.Lock()
+        # phrase index -> key, read when first needed
+        self.keys: Optional[Dict[int, str]] = None
+
+    def read(self) -> Dict[int, str]:
+        keys = {}
+        lines = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    index, _, key = line.strip().partition(" ")
+                    if index.isdigit() and key:
+                        keys[int(index)] = key
+                        lines += 1
+        if lines > 2 * len(keys) + 100:
+            # mostly replaced entries, rewrite it with only the current ones
+            with atomic_writer(self.path, "w") as f:
+                f.write("".join(f"{index} {key}\n" for index, key in keys.items()))
+        return keys
+
+    def record(self, index: int, key: str):
+        """
+        records that the phrase at index uses the audio with key
+        """
+        with self.lock:
+            if self.keys is None:
+                self.keys = self.read()
+            if self.keys.get(index) == key:
+                return
+            self.keys[index] = key
+            try:
+                with open(self.path, "a") as f:
+                    f.write(f"{index} {key}\n")
+            except FileNotFoundError:
+                # the category was removed
+                pass
+
+    def used_keys(self) -> Set[str]:
+        with self.lock:
+            if self.keys is None:
+                self.keys = self.read()
+            return set(self.keys.values())
+
+
+# root -> store, category -> index
+STORES: Dict[str, AudioStore] = {}
+INDEXES: Dict[str, CategoryAudio] = {}
+REGISTRY_LOCK = threading.Lock()
+
+
+def audio_store(config) -> AudioStore:
+    """
+    returns the store set under "tts" "store" in the config, limited to "tts" "store-max-mb"
+    """
+    tts = config.params.get("tts", {})
+    root = tts.get("store", STORE_PATH)
+    with REGISTRY_LOCK:
+        store = STORES.get(root)
+        if store is None:
+            store = STORES[root] = AudioStore(root, int(tts.get("store-max-mb", 1024) * 1024 * 1024))
+        return store
+
+
+def category_audio(category: str) -> CategoryAudio:
+    with REGISTRY_LOCK:
+        index = INDEXES.get(category)
+        if index is None:
+            index = INDEXES[category] = CategoryAudio(category)
+        return index
+
+
+def main():
+    from config import Config
+
+    parser = argparse.ArgumentParser(description="report on or clean up the shared audio store")
+    parser.add_argument("command", choices=["stats", "gc"],
+                        help="stats reports what the store holds, gc removes audio no category uses")
+    args = parser.parse_args()
+
+    config = Config("config.json")
+    store = audio_store(config)
+    stored = store.keys()
+    # key -> number of categories using it
+    users = {}
+    for category in config.params["phrase-categories"]:
+        for key in category_audio(category).used_keys():
+            users[key] = users.get(key, 0) + 1
+    unused = [key for key in stored if key not in users]
+
+    if args.command == "stats":
+        shared = sum(1 for key in stored if users.get(key, 0) > 1)
+        print(f"{len(stored)} files, {store.bytes / 1024 / 1024:.1f} MB in {store.root}, "
+              f"limit {store.max_bytes / 1024 / 1024:.0f} MB")
+        print(f"{shared} files shared by more than one category, saving "
+              f"{sum(users[key] - 1 for key in stored if users.get(key, 0) > 1)} syntheses")
+        print(f"{len(unused)} files used by no category")
+    else:
+        with store.lock:
+            for key in unused:
+                store.remove(stored[key])
+        print(f"removed {len(unused)} files used by no category")
+
+
+if __name__ == "__main__":
+    main()
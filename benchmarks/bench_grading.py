@@ -0,0 +1,66 @@
+"""
+Time to grade an answer and align its words for feedback, for phrases and paragraphs
+of increasing length with a few typos, a missing and an extra word, and for answers
+unrelated to the truth, run from the repository root with: python benchmarks/bench_grading.py
+"""
+import os
+import sys
+import time
+from random import Random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from grading import Grader, align_words
+
+WORDS = ("jag skulle vilja ha en kopp kaffe med mjolk och socker tack det var mycket gott igar "
+         "vi ses imorgon var ligger stationen hur mycket kostar biljetten").split()
+LENGTHS = [5, 20, 100, 300]
+ROUNDS = 200
+
+
+def sentence(random: Random, words: int) -> str:
+    return " ".join(random.choice(WORDS) for _ in range(words))
+
+
+def near_answer(random: Random, truth: str) -> str:
+    """
+    truth with a word left out, a word added and a typo in every twentieth word
+    """
+    words = truth.split()
+    del words[random.randrange(len(words))]
+    words.insert(random.randrange(len(words) + 1), random.choice(WORDS))
+    for i in range(0, len(words), 20):
+        word = words[i]
+        position = random.randrange(len(word))
+        words[i] = word[:position] + "x" + word[position + 1:]
+    return " ".join(words)
+
+
+def time_per_call(func, *args) -> float:
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        func(*args)
+    return (time.perf_counter() - start) / ROUNDS
+
+
+def main():
+    random = Random(0)
+    print(f"{'words':>6} {'chars':>6} {'exact':>9} {'near':>9} {'far':>9} {'diff near':>10} {'diff far':>10}  us per answer")
+    for length in LENGTHS:
+        truth = sentence(random, length)
+        near = near_answer(random, truth)
+        far = sentence(random, length)
+        exact = Grader(1.0)
+        fuzzy = Grader(0.9)
+        times = [time_per_call(exact.grade, near, truth),
+                 time_per_call(fuzzy.grade, near, truth),
+                 time_per_call(fuzzy.grade, far, truth),
+                 time_per_call(align_words, near.split(), truth.split()),
+                 time_per_call(align_words, far.split(), truth.split())]
+        print(f"{length:>6} {len(truth):>6} " + " ".join(f"{1e6 * t:>9.1f}" for t in times[:3])
+              + " " + " ".join(f"{1e6 * t:>10.1f}" for t in times[3:]))
+        print(f"{'':>14}near score {fuzzy.grade(near, truth).score:.3f}, far score {fuzzy.grade(far, truth).score:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Grading throughput of the compiled Normalizer against the previous
+str.replace based preprocess/replace_accents, on a batch of 1M answers,
+run from the repository root with: python benchmarks/bench_normalizer.py
+"""
+import json
+import os
+import string
+import sys
+import time
+from random import choice, randrange
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from normalizer import Normalizer
+
+ANSWERS = 1000000
+
+
+def old_preprocess(sentence: str) -> str:
+    sentence = sentence.strip().replace("\n", "").replace("\t", "")
+    sentence = sentence.lower()
+    for p in string.punctuation:
+        sentence = sentence.replace(p, "")
+    return sentence
+
+
+def old_replace_accents(sentence: str, accents_lookup: dict) -> str:
+    for k, v in accents_lookup.items():
+        sentence = sentence.replace(k, v)
+    return sentence
+
+
+def grade_old(answers: list, truths: list, accents_lookup: dict) -> int:
+    """
+    previous GUI.on_submit, truth normalised again on every submission
+    """
+    correct = 0
+    for answer, truth in zip(answers, truths):
+        processed_answer = old_preprocess(answer)
+        truth_no_accents = old_replace_accents(old_preprocess(truth), accents_lookup)
+        correct += processed_answer == truth_no_accents
+    return correct
+
+
+def grade_new(answers: list, indices: list, syntax: list, normalizer: Normalizer) -> int:
+    """
+    one translate of the answer plus a lookup of the cached truth
+    """
+    correct = 0
+    cache = {}
+    for answer, index in zip(answers, indices):
+        truth = cache.get(index)
+        if truth is None:
+            truth = cache[index] = normalizer.normalize(syntax[index][1])
+        correct += normalizer.normalize(answer) == truth
+    return correct
+
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(root, "config.json"), "r") as f:
+        params = json.load(f)
+    syntax = []
+    for category in os.listdir(os.path.join(root, "assets")):
+        with open(os.path.join(root, "assets", category, "phrases.json"), "r") as f:
+            syntax += json.load(f)["syntax"]
+
+    indices = [randrange(len(syntax)) for _ in range(ANSWERS)]
+    # half correct answers typed without accents, half answers to another phrase
+    answers = [old_replace_accents(syntax[i][1], params["accents-lookup"]) if randrange(2)
+               else syntax[choice(indices)][1] for i in indices]
+    truths = [syntax[i][1] for i in indices]
+
+    start = time.perf_counter()
+    old_correct = grade_old(answers, truths, params["accents-lookup"])
+    old = time.perf_counter() - start
+
+    start = time.perf_counter()
+    normalizer = Normalizer(params)
+    new_correct = grade_new(answers, indices, syntax, normalizer)
+    new = time.perf_counter() - start
+
+    print(f"{ANSWERS} answers, {len(syntax)} phrases")
+    print(f"str.replace: {old:.2f}s {ANSWERS / old:,.0f} answers/s ({old_correct} correct)")
+    print(f"Normalizer:  {new:.2f}s {ANSWERS / new:,.0f} answers/s ({new_correct} correct)")
+    print(f"speedup:     {old / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
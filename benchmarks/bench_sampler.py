@@ -0,0 +1,54 @@
+"""
+Compares the Fenwick tree sampler against random.choices + list.index,
+run from the repository root with: python benchmarks/bench_sampler.py
+"""
+import os
+import sys
+import time
+from random import choices, randrange
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sampler import WeightedSampler
+
+
+def choices_draw(syntax: list, weights: list) -> int:
+    """
+    previous implementation of Game.choose_phrase
+    """
+    selected_syntax = choices(syntax, weights=weights)
+    return syntax.index(selected_syntax[0])
+
+
+def time_choices(syntax: list, weights: list, draws: int) -> float:
+    start = time.perf_counter()
+    for _ in range(draws):
+        index = choices_draw(syntax, weights)
+        weights[index] = max(1, weights[index] - 0.4)
+    return (time.perf_counter() - start) / draws
+
+
+def time_sampler(weights: list, draws: int) -> (float, float):
+    start = time.perf_counter()
+    sampler = WeightedSampler(weights)
+    build = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(draws):
+        index = sampler.sample()
+        sampler.update(index, max(1, sampler.weights[index] - 0.4))
+    return build, (time.perf_counter() - start) / draws
+
+
+def main():
+    print(f"{'phrases':>10} {'choices (us)':>14} {'sampler (us)':>14} {'speedup':>9} {'build (ms)':>11}")
+    for size in [100, 1000, 10000, 50000, 500000]:
+        syntax = [[f"phrase {i}", f"fras {i}"] for i in range(size)]
+        weights = [1 + randrange(10) * 0.4 for _ in range(size)]
+        draws = max(10, min(1000, 5000000 // size))
+        old = time_choices(syntax, list(weights), draws)
+        build, new = time_sampler(list(weights), draws * 10)
+        print(f"{size:>10} {old * 1e6:>14.1f} {new * 1e6:>14.1f} {old / new:>8.0f}x {build * 1e3:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
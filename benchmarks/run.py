@@ -0,0 +1,240 @@
+"""
+Benchmark suite for the hot paths of pyLingo over synthetic categories,
+runs without a display, from the repository root:
+    python benchmarks/run.py                       time everything, compare with baseline.json
+    python benchmarks/run.py --save-baseline       store the results as the new baseline
+    python benchmarks/run.py --check               as above but fail if there is no baseline
+    python benchmarks/run.py --sizes 10,1000 --only choose_phrase
+Results are written to benchmarks/results.json, the exit code is 1 if any
+benchmark is slower than the baseline by more than --threshold, or if there is
+no baseline to compare with when run with --check.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from config import Config
+from headless import HeadlessGame
+from persistence import WeightsWriter
+from synthetic import generate_syntax, write_category
+
+BENCHMARKS = {}
+# shared by every benchmark game, flushed before the working directory is removed
+WRITER = WeightsWriter(max_delay=3600, max_pending=10 ** 9)
+
+
+def benchmark(func):
+    """
+    registers func as a benchmark, func(size) sets up a category of size
+    phrases and returns the function to time
+    """
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def measure(func, min_time: float = 0.2, rounds: int = 5) -> float:
+    """
+    returns seconds per call of func, func is called repeatedly in rounds each
+    lasting min_time / rounds and the fastest round is kept to reduce noise
+    """
+    func()
+    best = float("inf")
+    for _ in range(rounds):
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time / rounds:
+            func()
+            calls += 1
+            elapsed = time.perf_counter() - start
+        best = min(best, elapsed / calls)
+    return best
+
+
+def make_game(size: int) -> HeadlessGame:
+    if not os.path.exists(os.path.join("assets", f"synthetic{size}")):
+        write_category(".", f"synthetic{size}", size)
+    config = Config("config.json")
+    return HeadlessGame(f"synthetic{size}", config,
+                        weights=[1 + random.randrange(10) * 0.4 for _ in range(size)],
+                        persist=True,
+                        weights_writer=WRITER)
+
+
+@benchmark
+def choose_phrase(size: int):
+    game = make_game(size)
+    return game.choose_phrase
+
+
+@benchmark
+def preprocess(size: int):
+    game = make_game(size)
+    phrases = [s[1] for s in game.syntax]
+    return lambda: game.preprocess(random.choice(phrases))
+
+
+@benchmark
+def replace_accents(size: int):
+    game = make_game(size)
+    phrases = [game.preprocess(s[1]) for s in game.syntax]
+    return lambda: game.replace_accents(random.choice(phrases))
+
+
+@benchmark
+def uppercase_incorrect_words(size: int):
+    game = make_game(size)
+    truths = [game.preprocess(s[1]) for s in game.syntax]
+    attempts = [" ".join(reversed(t.split())) for t in truths]
+
+    def run():
+        i = random.randrange(size)
+        game.uppercase_incorrect_words(attempts[i], truths[i])
+    return run
+
+
+@benchmark
+def grade_batch_1000_answers(size: int):
+    game = make_game(size)
+    indices = [random.randrange(size) for _ in range(1000)]
+    answers = [game.syntax[i][1] if i % 2 else game.syntax[i][0] for i in indices]
+    return lambda: game.grade_batch(answers, indices, update_weights=False)
+
+
+@benchmark
+def save_weights(size: int):
+    game = make_game(size)
+
+    def run():
+        game.save_weights()
+        game.weights_writer.flush()
+    return run
+
+
+@benchmark
+def load_weights(size: int):
+    game = make_game(size)
+    game.save_weights()
+    game.weights_writer.flush()
+    return game.load_weights
+
+
+@benchmark
+def get_bullseye_coords(size: int):
+    from gui import GUI
+
+    game = make_game(size)
+    game.bullseye_radius = 90
+    return lambda: GUI.get_bullseye_coords(game)
+
+
+@benchmark
+def update_bullseye_coords_one_answer(size: int):
+    game = make_game(size)
+    coords = game.polar_coordinates_to_cartesian(game.weights, 10, 1, 90)
+    return lambda: game.update_cartesian_coordinates(coords, game.weights, [random.randrange(size)], 10, 1, 90)
+
+
+@benchmark
+def add_phrase_duplicate_check(size: int):
+    from add_content.phrase_index import PhraseIndex
+
+    game = make_game(size)
+    index = PhraseIndex(f"synthetic{size}", game.preprocess)
+    new_phrases = generate_syntax(5, seed=1)
+    return lambda: [index.contains(mt, nl) for mt, nl in new_phrases]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    returns list of (benchmark, size, ratio) slower than baseline by more than threshold
+    """
+    regressions = []
+    for name, sizes in results.items():
+        for size, seconds in sizes.items():
+            base = baseline.get(name, {}).get(size)
+            if base and seconds / base > 1 + threshold:
+                regressions.append((name, size, seconds / base))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="benchmark pyLingo hot paths")
+    parser.add_argument("--sizes", default="10,1000,100000,1000000", help="comma separated category sizes")
+    parser.add_argument("--only", nargs="*", default=None, choices=list(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds to run each benchmark for")
+    parser.add_argument("--results", default=os.path.join(ROOT, "benchmarks", "results.json"))
+    parser.add_argument("--baseline", default=os.path.join(ROOT, "benchmarks", "baseline.json"))
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fraction slower than baseline counted as a regression")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save-baseline", action="store_true")
+    mode.add_argument("--check", action="store_true", help="fail if there is no baseline to compare with")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    names = args.only or list(BENCHMARKS)
+
+    # the app reads and writes relative to the working directory
+    workdir = tempfile.mkdtemp(prefix="pylingo-benchmarks-")
+    shutil.copy(os.path.join(ROOT, "config.json"), workdir)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    results = {}
+    try:
+        for name in names:
+            results[name] = {}
+            for size in sizes:
+                random.seed(0)
+                try:
+                    func = BENCHMARKS[name](size)
+                except ImportError as e:
+                    print(f"{name:<36} skipped, {str(e)}")
+                    break
+                seconds = measure(func, args.min_time)
+                results[name][str(size)] = seconds
+                print(f"{name:<36} {size:>8} phrases {seconds * 1e6:>14.2f} us/call")
+    finally:
+        WRITER.flush()
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+    output = {"python": platform.python_version(),
+              "platform": platform.platform(),
+              "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "results": results}
+    with open(args.results, "w") as f:
+        json.dump(output, f, indent=4)
+    print(f"results written to {args.results}")
+
+    if args.save_baseline:
+        shutil.copy(args.results, args.baseline)
+        print(f"baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for name, size, ratio in regressions:
+            print(f"REGRESSION {name} at {size} phrases is {ratio:.2f}x the baseline")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions above {100 * args.threshold:.0f}% against {args.baseline}")
+    else:
+        print(f"WARNING no baseline at {args.baseline}, nothing was compared, "
+              f"save one with --save-baseline on the reference machine")
+        if args.check:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Startup timing of the desktop app, runs without a display, from the repository root:
+    python benchmarks/startup.py                    report and compare with startup_baseline.json
+    python benchmarks/startup.py --save-baseline    store the timings as the new baseline
+    python benchmarks/startup.py --check            as above but fail if there is no baseline
+Reports the import time of the slowest modules (python -X importtime), the time
+from launching python to the first phrase being on screen and to the bullseye
+being drawn, and which heavy modules were already imported when the phrase showed.
+The exit code is 1 if time to first phrase is over --budget milliseconds or any
+timing is slower than the baseline by more than --threshold, or if there is no
+baseline to compare with when run with --check.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# modules that should only be imported once they are needed
+HEAVY_MODULES = ["numpy", "matplotlib", "gtts", "playsound", "pyttsx3", "bullseye"]
+
+# run in a fresh interpreter, writes time.time() at each milestone as json to the file
+# named by sys.argv[3], not stdout, which background threads may still print to
+CHILD = """
+import json, os, sys, time
+marks = {"start": time.time()}
+import gui
+marks["imported"] = time.time()
+from config import Config
+config = Config("config.json")
+# audio is synthesised locally into a scratch store so the network isn't timed
+config.params.setdefault("tts", {}).update({"backend": "fake", "store": os.path.join(os.path.dirname(sys.argv[3]), "audio")})
+window = gui.GUI(sys.argv[1], config)
+window.show()
+# the phrase label is set by now, the bullseye is drawn by a timer that fires once events are processed
+marks["first_phrase"] = time.time()
+heavy = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+while window.bullseye_coords is None:
+    window.app.processEvents()
+marks["bullseye"] = time.time()
+window.weights_writer.close()
+window.audio_prefetcher.shutdown()
+with open(sys.argv[3], "w") as f:
+    json.dump({"marks": marks, "heavy": heavy, "phrase": window.phrase.text()}, f)
+"""
+
+
+def import_times(top: int) -> list:
+    """
+    returns [(module, cumulative ms)] of the top modules imported by gui.py, slowest first
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import gui"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # only modules imported directly by the app's own modules, not their dependencies
+        if name.startswith("  ") and not name.startswith("    "):
+            times.append((name.strip(), int(cumulative) / 1000))
+    return sorted(times, key=lambda t: t[1], reverse=True)[:top]
+
+
+def time_to_first_phrase(category: str) -> dict:
+    """
+    launches the app offscreen and returns milliseconds from launch to each milestone
+    """
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    with tempfile.TemporaryDirectory() as scratch:
+        marks_path = os.path.join(scratch, "marks.json")
+        launched = time.time()
+        subprocess.run([sys.executable, "-c", CHILD, category, json.dumps(HEAVY_MODULES), marks_path],
+                       cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        with open(marks_path, "r") as f:
+            output = json.load(f)
+    timings = {name: 1000 * (t - launched) for name, t in output["marks"].items()}
+    return {"timings": timings, "heavy": output["heavy"], "phrase": output["phrase"]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="time the startup of pyLingo")
+    parser.add_argument("--category", default="conversational")
+    parser.add_argument("--runs", type=int, default=5, help="launches to time, the fastest is kept")
+    parser.add_argument("--top", type=int, default=10, help="number of modules to list import times for")
+    parser.add_argument("--budget", type=float, default=1500, help="milliseconds allowed to the first phrase")
+    parser.add_argument("--baseline", default=os.path.join(ROOT, "benchmarks", "startup_baseline.json"))
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="fraction slower than baseline counted as a regression")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save-baseline", action="store_true")
+    mode.add_argument("--check", action="store_true", help="fail if there is no baseline to compare with")
+    args = parser.parse_args()
+
+    print("slowest imports of gui.py")
+    for name, ms in import_times(args.top):
+        print(f"    {name:<36} {ms:>8.1f} ms")
+
+    runs = [time_to_first_phrase(args.category) for _ in range(args.runs)]
+    timings = {name: min(run["timings"][name] for run in runs) for name in runs[0]["timings"]}
+    print(f"fastest of {args.runs} launches, ms after launching python")
+    for name, ms in timings.items():
+        print(f"    {name:<36} {ms:>8.1f} ms")
+    heavy = runs[0]["heavy"]
+    if heavy:
+        print(f"imported before the first phrase was shown: {', '.join(heavy)}")
+
+    failed = False
+    if timings["first_phrase"] > args.budget:
+        print(f"OVER BUDGET first phrase took {timings['first_phrase']:.0f} ms, the budget is {args.budget:.0f} ms")
+        failed = True
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(),
+                       "platform": platform.platform(),
+                       "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "timings": timings}, f, indent=4)
+        print(f"baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)["timings"]
+        for name, ms in timings.items():
+            if name in baseline and baseline[name] and ms / baseline[name] > 1 + args.threshold:
+                print(f"REGRESSION {name} is {ms / baseline[name]:.2f}x the baseline")
+                failed = True
+    else:
+        print(f"WARNING no baseline at {args.baseline}, nothing was compared, "
+              f"save one with --save-baseline on the reference machine")
+        failed = failed or args.check
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
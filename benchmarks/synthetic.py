@@ -0,0 +1,49 @@
+"""
+Generates synthetic categories of English/Swedish phrase pairs with
+realistic lengths and accented letters for benchmarking
+"""
+import json
+import os
+import random
+
+ENGLISH_WORDS = ["I", "you", "we", "they", "would", "like", "a", "the", "coffee", "cinnamon", "bun",
+                 "please", "where", "is", "station", "tomorrow", "yesterday", "evening", "to", "pay",
+                 "with", "card", "cash", "how", "much", "does", "it", "cost", "my", "friend", "have",
+                 "been", "there", "before", "thank", "very", "good", "at", "home", "weekend", "every",
+                 "can", "help", "me", "sorry", "understand", "speak", "slowly", "receipt", "bill"]
+
+SWEDISH_WORDS = ["jag", "du", "vi", "de", "skulle", "vilja", "en", "ett", "kaffe", "kanelbulle",
+                 "tack", "var", "är", "stationen", "imorgon", "igår", "kväll", "att", "betala", "med",
+                 "kort", "kontanter", "hur", "mycket", "kostar", "det", "min", "vän", "har", "varit",
+                 "där", "förut", "så", "bra", "hemma", "helgen", "varje", "kan", "hjälpa", "mig",
+                 "förlåt", "förstår", "prata", "långsamt", "kvittot", "notan", "också", "här", "öl", "räkor"]
+
+PUNCTUATION = ["", "", "", ".", "?", "!", ","]
+
+
+def sentence(words: list, rng: random.Random) -> str:
+    # most phrases are short, a few are long sentences
+    length = min(int(rng.lognormvariate(1.4, 0.5)) + 1, 25)
+    text = " ".join(rng.choice(words) for _ in range(length))
+    return text[0].upper() + text[1:] + rng.choice(PUNCTUATION)
+
+
+def generate_syntax(size: int, seed: int = 0) -> list:
+    """
+    returns list of size [english, swedish] phrase pairs, the same for the same seed
+    """
+    rng = random.Random(seed)
+    return [[sentence(ENGLISH_WORDS, rng), sentence(SWEDISH_WORDS, rng)] for _ in range(size)]
+
+
+def write_category(root: str, category: str, size: int, seed: int = 0) -> list:
+    """
+    writes a synthetic category in the layout the app expects, assets/<category>/phrases.json
+    and an empty audio folder, under root and returns its phrases
+    """
+    syntax = generate_syntax(size, seed)
+    folder = os.path.join(root, "assets", category)
+    os.makedirs(os.path.join(folder, "audio"), exist_ok=True)
+    with open(os.path.join(folder, "phrases.json"), "w") as f:
+        json.dump({"syntax": syntax}, f)
+    return syntax
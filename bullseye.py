@@ -0,0 +1,127 @@
+import numpy as np
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QColor, QImage, QPixmap
+from PyQt5.QtWidgets import QApplication, QGraphicsPixmapItem, QGraphicsScene
+
+
+class DensityLayer:
+    """
+    Draws the points of the bullseye as a density heatmap in a single cached
+    pixmap instead of one graphics item per phrase, used for large categories.
+    Moving points only repaints the pixels that changed and repaints are
+    throttled to the refresh rate of the display
+    """
+
+    def __init__(self, scene: QGraphicsScene, graphics_height: int, point_radius: int = 2):
+        self.graphics_height = graphics_height
+        # each point is drawn as a square of pixels this many pixels either side of it
+        self.point_radius = point_radius
+        self.counts = np.zeros((graphics_height, graphics_height), dtype=np.int32)
+        self.image = QImage(graphics_height, graphics_height, QImage.Format_ARGB32)
+        self.image.fill(QColor(0, 0, 0, 0))
+        self.item = QGraphicsPixmapItem()
+        self.item.setZValue(1)
+        scene.addItem(self.item)
+        self.dirty = set()
+
+        screen = QApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None else 60
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(int(1000 / max(refresh_rate, 1)))
+        self.timer.timeout.connect(self.repaint)
+
+    def pixels(self, coords: np.ndarray) -> (np.ndarray, np.ndarray):
+        """
+        returns row and column of the pixel of each coordinate
+        """
+        centre = self.graphics_height // 2
+        columns = np.clip(coords[:, 0] + centre, 0, self.graphics_height - 1)
+        rows = np.clip(coords[:, 1] + centre, 0, self.graphics_height - 1)
+        return rows, columns
+
+    @staticmethod
+    def colour(counts: np.ndarray) -> np.ndarray:
+        """
+        returns ARGB32 colour for number of points in pixel, white getting more opaque with more points
+        """
+        alpha = np.where(counts > 0, np.minimum(255, 90 + 40 * np.log2(np.maximum(counts, 1))), 0)
+        return (alpha.astype(np.uint32) << 24) | 0xFFFFFF
+
+    def density(self) -> np.ndarray:
+        """
+        returns number of points drawn over each pixel
+        """
+        r = self.point_radius
+        padded = np.pad(self.counts, r)
+        density = np.zeros_like(self.counts)
+        for dr in range(2 * r + 1):
+            for dc in range(2 * r + 1):
+                density += padded[dr:dr + self.graphics_height, dc:dc + self.graphics_height]
+        return density
+
+    def pixel_density(self, row: int, column: int) -> int:
+        """
+        returns number of points drawn over the pixel at row, column
+        """
+        r = self.point_radius
+        return int(self.counts[max(row - r, 0):row + r + 1, max(column - r, 0):column + r + 1].sum())
+
+    def set_points(self, coords: np.ndarray):
+        """
+        Replaces all points and repaints the whole heatmap
+        Parameters
+        ----------
+        coords: array of shape (n, 2) of point coordinates relative to the centre
+        """
+        self.counts[:] = 0
+        rows, columns = self.pixels(coords)
+        np.add.at(self.counts, (rows, columns), 1)
+        pixels = self.colour(self.density())
+        image = QImage(pixels.astype(np.uint32).tobytes(), self.graphics_height, self.graphics_height,
+                       QImage.Format_ARGB32)
+        # QImage doesn't own the buffer it was made from, so copy it
+        self.image = image.copy()
+        self.dirty.clear()
+        self.timer.stop()
+        self.item.setPixmap(QPixmap.fromImage(self.image))
+        self.item.show()
+
+    def move_points(self, old_coords: np.ndarray, new_coords: np.ndarray):
+        """
+        Moves points from old_coords to new_coords, the heatmap is repainted
+        at most once per display frame
+        """
+        old_rows, old_columns = self.pixels(old_coords)
+        new_rows, new_columns = self.pixels(new_coords)
+        np.add.at(self.counts, (old_rows, old_columns), -1)
+        np.add.at(self.counts, (new_rows, new_columns), 1)
+        self.dirty.update(zip(old_rows.tolist(), old_columns.tolist()))
+        self.dirty.update(zip(new_rows.tolist(), new_columns.tolist()))
+        if not self.timer.isActive():
+            self.timer.start()
+
+    def repaint(self):
+        """
+        repaints the pixels changed since the last repaint
+        """
+        if not self.dirty:
+            return
+        r = self.point_radius
+        # a moved point changes the colour of every pixel it is drawn over
+        pixels = set()
+        for row, column in self.dirty:
+            for pixel_row in range(max(row - r, 0), min(row + r + 1, self.graphics_height)):
+                for pixel_column in range(max(column - r, 0), min(column + r + 1, self.graphics_height)):
+                    pixels.add((pixel_row, pixel_column))
+        self.dirty.clear()
+        pixels = list(pixels)
+        densities = np.array([self.pixel_density(row, column) for row, column in pixels])
+        for (row, column), colour in zip(pixels, self.colour(densities).tolist()):
+            self.image.setPixel(column, row, colour)
+        self.item.setPixmap(QPixmap.fromImage(self.image))
+
+    def hide(self):
+        self.timer.stop()
+        self.dirty.clear()
+        self.item.hide()
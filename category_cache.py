@@ -0,0 +1,192 @@
+"""
+Keeps categories that have been practised, or are likely to be next, loaded
+so switching category doesn't read phrases.json and weights.json again.
+Categories are evicted least recently used first once their estimated size
+passes a memory budget, the category being practised is held by the game
+and doesn't count towards it.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+# rough bytes of python objects per phrase, excluding its text: the pair list and
+# its strings, a weight, two sampler floats and a bullseye coordinate
+PHRASE_OVERHEAD = 300
+# rough bytes per phrase held in a memory mapped pack rather than as python strings
+PACK_PHRASE_OVERHEAD = 150
+# rough bytes per cached normalised phrase
+NORMALIZED_OVERHEAD = 250
+# phrases sampled to estimate the average length of a category's phrases
+SIZE_SAMPLE = 100
+
+
+class CachedCategory:
+    """
+    Everything a game loads for a category
+    """
+
+    def __init__(self, category: str):
+        self.category = category
+        self.pack = None
+        self.syntax = None
+        self.deleted_phrases = set()
+        # phrase index -> (truth with accents, truth without accents)
+        self.normalized_truths = {}
+        self.audio_index = None
+        self.weights = None
+        self.sampler = None
+        # coordinates of the phrases on the bullseye, if they have been worked out
+        self.bullseye_coords = None
+
+    def size(self) -> int:
+        """
+        returns estimated bytes held by the category
+        """
+        count = len(self.syntax)
+        if self.pack is not None:
+            per_phrase = PACK_PHRASE_OVERHEAD
+        else:
+            sample = [self.syntax[i] for i in range(0, count, max(count // SIZE_SAMPLE, 1))]
+            text = sum(len(known) + len(new) for known, new in sample) // max(len(sample), 1)
+            per_phrase = PHRASE_OVERHEAD + text
+        return count * per_phrase + len(self.normalized_truths) * NORMALIZED_OVERHEAD
+
+
+class CategoryCache:
+    """
+    Least recently used categories up to max_bytes, with categories loaded
+    ahead of being asked for on a background thread
+    """
+
+    def __init__(self,
+                 load: Callable[[str], CachedCategory],
+                 evict: Callable[[CachedCategory], None],
+                 max_bytes: int = 256 * 1024 * 1024,
+                 preload: Callable[[str], CachedCategory] = None):
+        """
+        Parameters
+        ----------
+        load: reads a category, e.g. Game.read_category
+        evict: called with categories as they are dropped, e.g. to flush their weights
+        max_bytes: estimated memory the cached categories may use
+        preload: reads a category on the preload thread, defaults to load, can
+        do work that shouldn't hold up a category being loaded on demand
+        """
+        self.load = load
+        self.preload_category = preload or load
+        self.evict = evict
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        # category -> (cached category, its estimated size), least recently used first
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.bytes = 0
+        # category being practised, it isn't cached until it is put back
+        self.active = None
+        # category -> future of a preload running or queued
+        self.preloads: Dict[str, Future] = {}
+        # categories discarded while being preloaded, what the preload read may be out of date
+        self.stale = set()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="category-preload")
+
+    def __contains__(self, category: str) -> bool:
+        with self.lock:
+            return category in self.entries
+
+    def take(self, category: str) -> CachedCategory:
+        """
+        Returns category to be practised, removing it from the cache until it
+        is put back, it is loaded now if it isn't cached or being preloaded
+        """
+        with self.lock:
+            self.active = category
+            future = self.preloads.get(category)
+        if future is not None:
+            # the preload will have cached it, or failed and it is loaded below
+            future.exception()
+        with self.lock:
+            entry = self.entries.pop(category, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+                return entry[0]
+        return self.load(category)
+
+    def put(self, cached: CachedCategory):
+        """
+        caches cached as the most recently used category, evicting others if over budget
+        """
+        with self.lock:
+            if self.active == cached.category:
+                self.active = None
+            evicted = self.insert(cached)
+        for old in evicted:
+            self.evict(old)
+
+    def insert(self, cached: CachedCategory) -> list:
+        old = self.entries.pop(cached.category, None)
+        if old is not None:
+            self.bytes -= old[1]
+        size = cached.size()
+        self.entries[cached.category] = (cached, size)
+        self.bytes += size
+        evicted = []
+        # the category just put in is kept even if it is over budget on its own
+        while self.bytes > self.max_bytes and len(self.entries) > 1:
+            _, (old, old_size) = self.entries.popitem(last=False)
+            self.bytes -= old_size
+            evicted.append(old)
+        return evicted
+
+    def preload(self, categories: Iterable[str]):
+        """
+        loads categories that aren't cached on the background thread, most likely first
+        """
+        with self.lock:
+            for category in categories:
+                if category == self.active or category in self.entries or category in self.preloads:
+                    continue
+                self.preloads[category] = self.executor.submit(self.run_preload, category)
+
+    def run_preload(self, category: str):
+        try:
+            cached = self.preload_category(category)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"couldnt preload category {category}: {str(e)}")
+            cached = None
+        with self.lock:
+            del self.preloads[category]
+            if category in self.stale:
+                self.stale.discard(category)
+                return
+            # put back with newer weights while it was loading, if it was taken
+            # instead take is waiting for this to finish and pops it straight out
+            if cached is None or category in self.entries:
+                return
+            evicted = self.insert(cached)
+        for old in evicted:
+            self.evict(old)
+
+    def discard(self, category: str) -> Optional[CachedCategory]:
+        """
+        drops category, e.g. because its files changed, returns it if it was cached
+        """
+        with self.lock:
+            if category in self.preloads:
+                self.stale.add(category)
+            entry = self.entries.pop(category, None)
+            if entry is None:
+                return None
+            self.bytes -= entry[1]
+        self.evict(entry[0])
+        return entry[0]
+
+    def clear(self):
+        with self.lock:
+            evicted = [cached for cached, _ in self.entries.values()]
+            self.entries.clear()
+            self.bytes = 0
+        for cached in evicted:
+            self.evict(cached)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,229 @@
+"""
+Compiles a category into a single binary pack file that Game opens with mmap,
+build packs from the repository root with: python category_pack.py [category ...]
+
+Layout, all integers little endian:
+    header: magic, version, phrase count, normalizer fingerprint, section offsets
+    sections: string tables for the known language, new language, new language
+    preprocessed with accents and without accents and the audio filenames,
+    followed by the float64 weights, so they load as exactly the floats saved in
+    weights.json, and the deleted phrases, a uint64 count followed by uint32 indices
+A string table is (count + 1) uint64 offsets into the utf-8 blob that follows them.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+from typing import List, Optional, Set
+
+from config import Config
+from normalizer import Normalizer
+from persistence import write_bytes_atomic
+from phrase_journal import journal_path, phrases_path, read_phrases
+
+MAGIC = b"PYLPACK1"
+VERSION = 3
+PACK_NAME = "category.pack"
+
+KNOWN, NEW, NORMALIZED, NORMALIZED_NO_ACCENTS, AUDIO, WEIGHTS, DELETED = range(7)
+SECTIONS = 7
+
+HEADER = struct.Struct(f"<8sII16s{SECTIONS}Q")
+
+
+def pack_path(category: str) -> str:
+    return os.path.join("assets", category, PACK_NAME)
+
+
+def pack_is_current(category: str) -> bool:
+    """
+    returns True if the pack exists and is newer than the phrases and phrase journal it
+    was built from, weights and audio in the pack are only a snapshot so changes to them don't count
+    """
+    path = pack_path(category)
+    if not os.path.exists(path):
+        return False
+    mtime = os.path.getmtime(path)
+    if os.path.exists(journal_path(category)) and os.path.getmtime(journal_path(category)) > mtime:
+        return False
+    return mtime >= os.path.getmtime(phrases_path(category))
+
+
+def string_table(strings: List[str]) -> bytes:
+    """
+    encodes strings as offsets followed by a blob
+    """
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("Q", [0])
+    for e in encoded:
+        offsets.append(offsets[-1] + len(e))
+    if sys.byteorder != "little":
+        offsets.byteswap()
+    return offsets.tobytes() + b"".join(encoded)
+
+
+def pack_bytes(category: str, normalizer: Normalizer) -> bytes:
+    """
+    Compiles phrases.json, weights.json and the audio folder of category into a pack
+    Parameters
+    ----------
+    category: name of the category
+    normalizer: normalizer used to precompute the normalised answers
+
+    Returns
+    -------
+    contents of the pack
+    """
+    folder = os.path.join("assets", category)
+    syntax, deleted = read_phrases(category)
+    count = len(syntax)
+
+    weights = count * [1]
+    weights_path = os.path.join(folder, "weights.json")
+    if os.path.exists(weights_path):
+        with open(weights_path, "r") as f:
+            saved_weights = json.load(f)["weights"]
+        if len(saved_weights) == count:
+            weights = saved_weights
+
+    audio = count * [""]
+    audio_folder = os.path.join(folder, "audio")
+    if os.path.isdir(audio_folder):
+        for f in os.listdir(audio_folder):
+            number = f.split(".")[0]
+            if number.isdigit() and int(number) < count:
+                audio[int(number)] = f
+
+    normalized = [normalizer.preprocess(s[1]) for s in syntax]
+    sections = [string_table([s[0] for s in syntax]),
+                string_table([s[1] for s in syntax]),
+                string_table(normalized),
+                string_table([normalizer.replace_accents(s) for s in normalized]),
+                string_table(audio)]
+    weights_array = array("d", weights)
+    if sys.byteorder != "little":
+        weights_array.byteswap()
+    sections.append(weights_array.tobytes())
+    deleted_array = array("I", sorted(deleted))
+    if sys.byteorder != "little":
+        deleted_array.byteswap()
+    sections.append(struct.pack("<Q", len(deleted_array)) + deleted_array.tobytes())
+
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        # keep sections 8 byte aligned so they can be cast in place
+        position += -position % 8
+        offsets.append(position)
+        position += len(section)
+
+    data = bytearray(position)
+    HEADER.pack_into(data, 0, MAGIC, VERSION, count, normalizer.fingerprint, *offsets)
+    for offset, section in zip(offsets, sections):
+        data[offset:offset + len(section)] = section
+
+    return bytes(data)
+
+
+def build_pack(category: str, normalizer: Normalizer) -> str:
+    """
+    Compiles category into a pack next to its phrases.json and returns the path of the pack
+    """
+    path = pack_path(category)
+    write_bytes_atomic(path, pack_bytes(category, normalizer))
+    return path
+
+
+class PackPhrases(Sequence):
+    """
+    Read only list of [known language, new language] pairs backed by a pack,
+    can be used in place of Game.syntax
+    """
+
+    def __init__(self, pack: "CategoryPack"):
+        self.pack = pack
+
+    def __len__(self) -> int:
+        return self.pack.count
+
+    def __getitem__(self, index: int) -> List[str]:
+        if index < 0:
+            index += self.pack.count
+        if not 0 <= index < self.pack.count:
+            raise IndexError("phrase index out of range")
+        return [self.pack.string(KNOWN, index), self.pack.string(NEW, index)]
+
+
+class CategoryPack:
+    """
+    Lazily reads a pack written by build_pack, only the pages of the
+    file that are actually accessed are read from disk
+    """
+
+    def __init__(self, path: str = None, buffer=None):
+        # modification time of the pack file, None for packs not read from a file
+        self.mtime = None
+        if buffer is None:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.mtime = os.fstat(f.fileno()).st_mtime_ns
+        self.buffer = buffer
+        magic, version, self.count, self.fingerprint, *self.offsets = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} category pack")
+        self.phrases = PackPhrases(self)
+
+    def string(self, section: int, index: int) -> str:
+        """
+        returns string at index in string table section
+        """
+        offset = self.offsets[section]
+        start, end = struct.unpack_from("<QQ", self.buffer, offset + 8 * index)
+        blob = offset + 8 * (self.count + 1)
+        return str(self.buffer[blob + start:blob + end], "utf-8")
+
+    def normalized_truth(self, index: int) -> (str, str):
+        """
+        returns the precomputed preprocessed new language phrase, with and without accents
+        """
+        return self.string(NORMALIZED, index), self.string(NORMALIZED_NO_ACCENTS, index)
+
+    def audio_file(self, index: int) -> Optional[str]:
+        """
+        returns filename of the audio for phrase at index, None if there was no audio
+        """
+        return self.string(AUDIO, index) or None
+
+    def weights(self) -> List[float]:
+        """
+        returns the weights stored when the pack was built
+        """
+        offset = self.offsets[WEIGHTS]
+        weights = array("d")
+        weights.frombytes(self.buffer[offset:offset + 8 * self.count])
+        if sys.byteorder != "little":
+            weights.byteswap()
+        return weights.tolist()
+
+    def deleted(self) -> Set[int]:
+        """
+        returns indices of deleted phrases
+        """
+        offset = self.offsets[DELETED]
+        count, = struct.unpack_from("<Q", self.buffer, offset)
+        deleted = array("I")
+        deleted.frombytes(self.buffer[offset + 8:offset + 8 + 4 * count])
+        if sys.byteorder != "little":
+            deleted.byteswap()
+        return set(deleted)
+
+
+if __name__ == "__main__":
+    config = Config("config.json")
+    normalizer = Normalizer(config.params)
+    categories = sys.argv[1:] or config.params["phrase-categories"]
+    for category in categories:
+        print(f"built {build_pack(category, normalizer)}")
@@ -1,6 +1,6 @@
 import json
 import os
-from typing import List
+from typing import List, Set
 
 
 class Config:
@@ -27,6 +27,23 @@ class Config:
         categories = os.listdir("assets")
         return categories
 
+    def reload(self) -> Set[str]:
+        """
+        Reads the config file again and returns the top level keys whose values
+        changed, phrase-categories is kept as it is. If the file can't be read,
+        e.g. because an editor is part way through saving it, nothing changes
+        """
+        try:
+            with open(self.filepath, "r") as f:
+                params = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"couldnt reload config file {self.filepath}: {str(e)}")
+            return set()
+        params["phrase-categories"] = self.params["phrase-categories"]
+        changed = {key for key in params.keys() | self.params.keys() if params.get(key) != self.params.get(key)}
+        self.params = params
+        return changed
+
     def write_to_file(self):
 
         with open(self.filepath, "w") as f:
@@ -1,13 +1,47 @@
+from __future__ import annotations
+
 import json
 import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import chain, repeat
+from audio_index import AudioIndex
+from audio_store import audio_key, audio_store, category_audio
+from category_cache import CachedCategory
+from category_pack import CategoryPack, pack_is_current, pack_path
 from config import Config
-from random import choices
-from playsound import playsound, PlaysoundException
-import string
-import gtts
-from gtts.tts import gTTSError
-from typing import List
-import numpy as np
+from grading import DELETE, EQUAL, INSERT, Grader, align_words, grade_chunk
+from typing import List, Optional, Sequence, Set, TYPE_CHECKING
+from normalizer import Normalizer
+from persistence import WeightsWriter
+from phrase_journal import phrase_journal, read_phrases
+from prefetch import AudioPrefetcher
+from sampler import WeightedSampler
+from tts import category_language, configured_backend
+
+if TYPE_CHECKING:
+    # numpy and playsound are imported where they are used so starting the app doesn't wait for them
+    import numpy as np
+
+# answers normalised together by grade_batch, and sent to a worker process at a time
+BATCH_CHUNK = 10000
+
+
+def read_category_phrases(category: str, pack: CategoryPack = None) -> (Optional[CategoryPack], list, Set[int]):
+    """
+    returns the pack phrases were read from, the phrases and the indices of deleted phrases of
+    category, read from pack if given, else from the category pack if one has been built since
+    phrases.json last changed otherwise from phrases.json
+    """
+    if pack is None and pack_is_current(category):
+        try:
+            pack = CategoryPack(pack_path(category))
+        except ValueError as e:
+            print(f"{str(e)}, rebuild it with category_pack.py, reading phrases.json instead")
+    if pack is not None:
+        return pack, pack.phrases, pack.deleted()
+    # phrases.json with the phrases added since it was written replayed from the journal
+    syntax, deleted = read_phrases(category)
+    return None, syntax, deleted
 
 
 class Game:
@@ -16,14 +50,74 @@ class Game:
     implemented should be overrided
     """
 
-    def __init__(self, phrases_category: str, config: Config):
+    def __init__(self,
+                 phrases_category: str,
+                 config: Config,
+                 weights_writer: WeightsWriter = None,
+                 audio_prefetcher: AudioPrefetcher = None):
+        """
+        Parameters
+        ----------
+        phrases_category: category of phrases to ask
+        config: configuration
+        weights_writer: writer used to save weights, pass one to share it between games
+        audio_prefetcher: prefetcher used to synthesise audio, pass one to share it between games
+        """
         self.config = config
         self.reward = self.config.params["reward"]
         self.weights = None
+        self.sampler = None
+        # indices of weights changed since the graphic was last updated
+        self.changed_weights = set()
+        if weights_writer is None:
+            persistence = self.config.params.get("persistence", {})
+            weights_writer = WeightsWriter(persistence.get("max-delay", 2.0),
+                                           persistence.get("max-pending", 50))
+        self.weights_writer = weights_writer
+        self.normalizer = Normalizer(self.config.params)
+        self.grader = Grader(self.config.params.get("grading", {}).get("threshold", 1.0))
+        # phrase index -> (truth with accents, truth without accents)
+        self.normalized_truths = {}
+        # grade of the last answer checked
+        self.grade = None
+        self.processed_answer = None
+        self.processed_swedish_with_accents = None
+        self.processed_swedish_no_accents = None
+        if audio_prefetcher is None:
+            tts = self.config.params.get("tts", {})
+            audio_prefetcher = AudioPrefetcher(configured_backend(self.config), tts.get("prefetch-workers", 2))
+        self.audio_prefetcher = audio_prefetcher
+        self.tts_backend = audio_prefetcher.backend
+        # synthesised audio, shared by every category
+        self.audio_store = audio_store(self.config)
         self.supress_warnings=False
         self.syntax = None
+        # compiled category, see category_pack.py, None if phrases came from json
+        self.pack = None
+        self.audio_index = None
+        # indices of phrases deleted from the category, kept so later indices don't shift
+        self.deleted_phrases = set()
         self.phrases_category = phrases_category
 
+    def apply_config(self, changed: Set[str]):
+        """
+        Applies config params that changed while the game was running
+        Parameters
+        ----------
+        changed: top level keys of config params that changed, see Config.reload
+        """
+        if "reward" in changed:
+            self.reward = self.config.params["reward"]
+        if changed & {"accents-lookup", "unicode-folding"}:
+            self.normalizer = Normalizer(self.config.params)
+            self.normalized_truths = {}
+        if "grading" in changed:
+            self.grader = Grader(self.config.params.get("grading", {}).get("threshold", 1.0))
+        if "persistence" in changed:
+            persistence = self.config.params.get("persistence", {})
+            self.weights_writer.max_delay = persistence.get("max-delay", 2.0)
+            self.weights_writer.max_pending = persistence.get("max-pending", 50)
+
     def run(self):
 
         """
@@ -40,43 +134,116 @@ class Game:
     def new_phrase(self):
         self.save_weights()
         self.selected_index, self.language1, self.language2 = self.choose_phrase()
+        self.prefetch_audio()
         self.update_phrase(self.language1)
 
     def preprocess(self, sentence: str):
         """
         preprocess a sentence
         """
-        sentence = sentence.strip().replace("\n", "").replace("\t", "")
-        sentence = sentence.lower()
-
-        for p in string.punctuation:
-            sentence = sentence.replace(p, "")
-
-        return sentence
+        return self.normalizer.preprocess(sentence)
 
     def replace_accents(self, sentence):
         """
         replace letters in sentence containing non-primary
         language accents with primary language equivalents
         """
-        accents_lookup = self.config.params["accents-lookup"]
-        for k, v in accents_lookup.items():
-            sentence = sentence.replace(k, v)
-        return sentence
+        return self.normalizer.replace_accents(sentence)
+
+    def normalized_truth(self, index: int) -> (str, str):
+        """
+        returns the new language phrase at index preprocessed, with and without
+        accents, normalising it on first use only
+        """
+        truth = self.normalized_truths.get(index)
+        if truth is None and self.pack is not None and self.pack.fingerprint == self.normalizer.fingerprint:
+            return self.pack.normalized_truth(index)
+        if truth is None:
+            with_accents = self.preprocess(self.syntax[index][1])
+            truth = (with_accents, self.replace_accents(with_accents))
+            self.normalized_truths[index] = truth
+        return truth
+
+    def check_answer(self, answer: str) -> bool:
+        """
+        Grades answer against the new language phrase being asked, accepting
+        it if it is close enough for the grading threshold in the config,
+        the normalised answer and truth and the grade are kept for feedback
+        """
+        self.processed_answer = self.normalizer.normalize(answer)
+        self.processed_swedish_with_accents, self.processed_swedish_no_accents = \
+            self.normalized_truth(self.selected_index)
+        self.grade = self.grader.grade(self.processed_answer, self.processed_swedish_no_accents)
+        return self.grade.accepted
 
     def uppercase_incorrect_words(self, attempt: str, truth: str):
         """
-        returns string with incorrect words in uppercase
+        returns attempt aligned with truth, words that are wrong or
+        extra in uppercase and words that are missing as _
         """
+        truth_no_accents = self.replace_accents(truth)
+        if self.grade is not None and self.grade.attempt == attempt and self.grade.truth == truth_no_accents:
+            diff = self.grade.diff
+        else:
+            diff = align_words(attempt.split(), truth_no_accents.split())
+        truth_words = truth.split()
+        if len(truth_words) != len(truth_no_accents.split()):
+            # an accent replacement changed the spacing, show the truth without accents
+            truth_words = truth_no_accents.split()
         out = []
-        for a, t in zip(attempt.split(), truth.split()):
-            if a != self.replace_accents(t):
-                out.append(a.upper())
+        position = 0
+        for edit, attempted, _ in diff:
+            if edit == EQUAL:
+                out.append(truth_words[position].lower())
+            elif edit == DELETE:
+                out.append("_")
             else:
-                out.append(t.lower())
+                out.append(attempted.upper())
+            if edit != INSERT:
+                position += 1
         out = " ".join(out)
         return out
 
+    def grade_batch(self,
+                    answers: Sequence[str],
+                    indices: Sequence[int],
+                    workers: int = 0,
+                    chunk_size: int = BATCH_CHUNK,
+                    update_weights: bool = True) -> List[bool]:
+        """
+        Grades many answers at once, e.g. an exam, or answers given before
+        accents-lookup changed, answers are normalised a chunk at a time and
+        each phrase is normalised once however many answers it has
+        Parameters
+        ----------
+        answers: answers as typed
+        indices: index of the phrase each answer was given to
+        workers: processes to grade chunks in, 0 grades them in this process
+        chunk_size: answers normalised together
+        update_weights: change the weights as correct and incorrect would for each
+        answer in turn, rebuilding the sampler and saving the weights once
+
+        Returns
+        -------
+        whether each answer was accepted
+        """
+        if len(answers) != len(indices):
+            raise ValueError(f"{len(answers)} answers given for {len(indices)} phrases")
+        truths = {index: self.normalized_truth(index)[1] for index in set(indices)}
+        starts = range(0, len(answers), chunk_size)
+        answer_chunks = [answers[start:start + chunk_size] for start in starts]
+        truth_chunks = [[truths[index] for index in indices[start:start + chunk_size]] for start in starts]
+        if workers > 0 and len(answer_chunks) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                verdicts = list(chain.from_iterable(pool.map(grade_chunk, repeat(self.normalizer), repeat(self.grader),
+                                                             answer_chunks, truth_chunks)))
+        else:
+            verdicts = list(chain.from_iterable(map(grade_chunk, repeat(self.normalizer), repeat(self.grader),
+                                                    answer_chunks, truth_chunks)))
+        if update_weights:
+            self.apply_verdicts(indices, verdicts)
+        return verdicts
+
     def polar_coordinate_to_cartesian(self,
                                       total_phrases: int,
                                       phrase_index: int,
@@ -84,6 +251,7 @@ class Game:
                                       max_score: int,
                                       min_score: int,
                                       circle_radius: int) -> List[int]:
+        import numpy as np
 
         score = score - min_score
         theta = (phrase_index/total_phrases)*2*np.pi
@@ -95,23 +263,117 @@ class Game:
 
         return [x, y]
 
+    def polar_coordinates_to_cartesian(self,
+                                       weights: List[float],
+                                       max_score: int,
+                                       min_score: int,
+                                       circle_radius: int) -> np.ndarray:
+        """
+        Vectorised polar_coordinate_to_cartesian for every phrase at once
+        Parameters
+        ----------
+        weights: weight of every phrase, used as the score
+        max_score: score at the edge of the circle
+        min_score: score at the centre of the circle
+        circle_radius: radius of the circle
+
+        Returns
+        -------
+        array of shape (len(weights), 2) with the x, y coordinate of each phrase
+        """
+        import numpy as np
+
+        total_phrases = len(weights)
+        return self.scores_to_cartesian(np.arange(total_phrases),
+                                        np.asarray(weights, dtype=float),
+                                        total_phrases,
+                                        max_score,
+                                        min_score,
+                                        circle_radius)
+
+    def update_cartesian_coordinates(self,
+                                     coords: np.ndarray,
+                                     weights: List[float],
+                                     indices: List[int],
+                                     max_score: int,
+                                     min_score: int,
+                                     circle_radius: int) -> np.ndarray:
+        """
+        Recomputes coordinates in coords, as returned by polar_coordinates_to_cartesian,
+        only for the phrases at indices, coords is updated in place and returned
+        """
+        import numpy as np
+
+        indices = np.asarray(indices, dtype=int)
+        scores = np.array([weights[i] for i in indices.tolist()], dtype=float)
+        coords[indices] = self.scores_to_cartesian(indices,
+                                                   scores,
+                                                   len(weights),
+                                                   max_score,
+                                                   min_score,
+                                                   circle_radius)
+        return coords
+
+    @staticmethod
+    def scores_to_cartesian(indices: np.ndarray,
+                            scores: np.ndarray,
+                            total_phrases: int,
+                            max_score: int,
+                            min_score: int,
+                            circle_radius: int) -> np.ndarray:
+        """
+        array version of polar_coordinate_to_cartesian, returns array of shape (len(indices), 2)
+        """
+        import numpy as np
+
+        scores = scores - min_score
+        theta = (indices/total_phrases)*2*np.pi
+        scale_ratio = circle_radius/max_score
+
+        coords = np.empty((len(indices), 2), dtype=int)
+        # astype truncates towards zero like int() does
+        coords[:, 0] = (scale_ratio * scores * np.cos(theta)).astype(int)
+        coords[:, 1] = (scale_ratio * scores * np.sin(theta)).astype(int)
+        return coords
+
+    def weights_path(self) -> str:
+        return os.path.join("assets", self.phrases_category, "weights.json")
+
     def load_weights(self):
         """
         Loads the weights from json file
         """
-        path = os.path.join("assets", self.phrases_category, "weights.json")
+        path = self.weights_path()
+        # make sure a pending write of this file isn't still queued
+        self.weights_writer.flush(path)
         if os.path.exists(path):
             with open(path, "r") as f:
                 self.weights = json.load(f)["weights"]
+            self.extend_weights()
+            self.build_sampler()
+            return True
+        elif self.pack is not None:
+            self.weights = self.pack.weights()
+            self.build_sampler()
             return True
         else:
             return False
 
+    def extend_weights(self):
+        """
+        gives phrases added since the weights were saved the starting weight,
+        phrases are only ever appended so the saved weights still line up
+        """
+        if self.syntax is not None and len(self.weights) < len(self.syntax):
+            self.weights += (len(self.syntax) - len(self.weights)) * [1]
+
     def save_weights(self):
-        """saves weights to json file"""
-        path = os.path.join("assets", self.phrases_category, "weights.json")
-        with open(path, "w") as f:
-            json.dump({"weights": self.weights}, f)
+        """
+        queues weights to be saved to json file, the write happens on a
+        background thread, call self.weights_writer.flush() to wait for it
+        """
+        path = self.weights_path()
+        self.weights_writer.schedule(path, self.weights)
 
     def intro(self):
         pass
@@ -127,20 +389,76 @@ class Game:
     def get_external_audio(self, path: str, phrase: str) -> bool:
 
         """
-        If audio file isn't present downloads file from google api
+        If audio file isn't present synthesises it with the text to speech backend,
+        waiting for it if it is already being prefetched
         """
+        return self.audio_prefetcher.resolve(path, phrase, self.category_language())
 
-        try:
-            tts = gtts.gTTS(phrase, lang="sv")
-        except AssertionError as e:
-            print(f"{str(e)} for '{phrase}'")
-            return False
-        try:
-            tts.save(path)
-        except gTTSError as e:
-            print(e)
-            return False
-        return True
+    def category_language(self) -> str:
+        """
+        returns language code of the new language phrases of the current category
+        """
+        return category_language(self.config, self.phrases_category)
+
+    def audio_folder(self) -> str:
+        return os.path.join("assets", self.phrases_category, "audio")
+
+    def find_audio(self, index: int) -> Optional[str]:
+        """
+        returns path of audio file for phrase at index, None if there is no audio file,
+        files in the category's audio folder come first, then the audio store
+        """
+        path = self.audio_index.get(index)
+        if path is None:
+            key = self.audio_key(self.syntax[index][1])
+            path = self.audio_store.find(key, self.tts_backend.extension)
+            if path is not None:
+                category_audio(self.phrases_category).record(index, key)
+        return path
+
+    def audio_key(self, phrase: str) -> str:
+        """
+        returns key of the audio of new language phrase in the audio store
+        """
+        return audio_key(phrase, self.category_language(), self.tts_backend.voice, self.tts_backend.name)
+
+    def prefetch_audio(self):
+        """
+        starts synthesising audio for the current phrase in the background
+        if it has none, so it is ready by the time it is played
+        """
+        path = self.find_audio(self.selected_index)
+        if path is None:
+            self.synthesize_audio(self.selected_index, self.language2)
+        else:
+            self.preload_audio(path)
+
+    def preload_audio(self, path: str):
+        """
+        called with the audio file of a phrase about to be asked, possibly from a
+        prefetch thread, so games that play audio can get it ready
+        """
+        pass
+
+    def synthesize_audio(self, index: int, phrase: str) -> Future:
+        """
+        synthesises audio for phrase at index into the audio store unless it is
+        already there or being synthesised, e.g. for the same phrase in another
+        category, returns future resolving to True once the file exists
+        """
+        key = self.audio_key(phrase)
+        audio_path = self.audio_store.path(key, self.tts_backend.extension, create=True)
+        store, audio = self.audio_store, category_audio(self.phrases_category)
+
+        def on_done(future: Future):
+            if not future.cancelled() and future.result():
+                store.record(audio_path)
+                audio.record(index, key)
+                self.preload_audio(audio_path)
+
+        future = self.audio_prefetcher.prefetch(audio_path, phrase, self.category_language())
+        future.add_done_callback(on_done)
+        return future
 
     def incorrect(self):
         """give feedback that input was incorrect"""
@@ -189,6 +507,8 @@ class Game:
         Plays audio file
         filepath: filepath to mp3 file
         """
+        from playsound import playsound, PlaysoundException
+
         try:
             playsound(filepath)
         except PlaysoundException as e:
@@ -200,42 +520,152 @@ class Game:
         """
         raise NotImplementedError
 
-    def load_phrases(self):
-        path = os.path.join("assets", self.phrases_category, "phrases.json")
+    def load_phrases(self, pack: CategoryPack = None):
+        """
+        Loads phrases, from pack if given, else from the category pack if one
+        has been built since phrases.json last changed otherwise from phrases.json
+        """
+        self.normalized_truths = {}
+        self.pack, self.syntax, self.deleted_phrases = read_category_phrases(self.phrases_category, pack)
+        self.audio_index = AudioIndex(self.audio_folder(), self.pack)
 
-        with open(path, "r") as f:
-            self.syntax = json.load(f)["syntax"]
+    def read_category(self, category: str) -> CachedCategory:
+        """
+        Reads the phrases and weights of category without changing the game,
+        safe to call from a background thread, see use_category
+        """
+        cached = CachedCategory(category)
+        cached.pack, cached.syntax, cached.deleted_phrases = read_category_phrases(category)
+        cached.audio_index = AudioIndex(os.path.join("assets", category, "audio"), cached.pack)
+        path = os.path.join("assets", category, "weights.json")
+        self.weights_writer.flush(path)
+        weights = None
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                weights = json.load(f)["weights"]
+        elif cached.pack is not None:
+            weights = cached.pack.weights()
+        if weights is None or len(weights) > len(cached.syntax):
+            weights = len(cached.syntax) * [1]
+        weights += (len(cached.syntax) - len(weights)) * [1]
+        cached.weights = weights
+        cached.sampler = self.new_sampler(weights, cached.deleted_phrases)
+        return cached
+
+    def use_category(self, cached: CachedCategory):
+        """
+        makes cached, from read_category or a CategoryCache, the category being practised
+        """
+        self.phrases_category = cached.category
+        self.pack = cached.pack
+        self.syntax = cached.syntax
+        self.deleted_phrases = cached.deleted_phrases
+        self.normalized_truths = cached.normalized_truths
+        self.audio_index = cached.audio_index
+        self.weights = cached.weights
+        self.sampler = cached.sampler
+        self.changed_weights.clear()
+
+    def cached_category(self) -> CachedCategory:
+        """
+        returns the state of the category being practised, to be kept in a CategoryCache
+        """
+        cached = CachedCategory(self.phrases_category)
+        cached.pack = self.pack
+        cached.syntax = self.syntax
+        cached.deleted_phrases = self.deleted_phrases
+        cached.normalized_truths = self.normalized_truths
+        cached.audio_index = self.audio_index
+        cached.weights = self.weights
+        cached.sampler = self.sampler
+        return cached
+
+    def reload_phrases(self) -> bool:
+        """
+        Loads the category's phrases again after they changed on disk, keeping
+        the weights and the phrase being asked, returns True if phrases were
+        added or deleted
+        """
+        count, deleted = len(self.syntax), self.deleted_phrases
+        self.load_phrases()
+        if len(self.weights) > len(self.syntax):
+            # phrases.json was replaced rather than appended to, the weights no longer line up
+            self.reset_weights()
+            self.new_phrase()
+            return True
+        self.extend_weights()
+        self.build_sampler()
+        return len(self.syntax) != count or self.deleted_phrases != deleted
 
     def save_phrases(self, category: str, syntax: list):
-
-        path = os.path.join("assets", category, "phrases.json")
-
-        with open(path, "w") as f:
-            json.dump({"syntax": syntax}, f)
+        """
+        Saves phrases of syntax that category doesn't have yet, syntax must start
+        with the category's phrases, the new ones are appended to its journal
+        """
+        journal = phrase_journal(category)
+        if journal.sequence is None:
+            journal.read()
+        journal.add(syntax[journal.length:])
 
 
     def choose_phrase(self) -> (int, str, str):
         """
         Chooses phrase to test with
         """
-        selected_syntax = choices(self.syntax, weights=self.weights)
-        selected_index = self.syntax.index(selected_syntax[0])
-        language1 = selected_syntax[0][0]
-        language2 = selected_syntax[0][1]
+        if self.sampler is None or len(self.sampler) != len(self.weights):
+            self.build_sampler()
+        selected_index = self.sampler.sample()
+        language1 = self.syntax[selected_index][0]
+        language2 = self.syntax[selected_index][1]
 
         return selected_index, language1, language2
 
+    def build_sampler(self):
+        """
+        rebuilds the sampler used to choose phrases from the current weights,
+        must be called whenever self.weights is replaced
+        """
+        self.sampler = self.new_sampler(self.weights, self.deleted_phrases)
+
+    @staticmethod
+    def new_sampler(weights: List[float], deleted_phrases: Set[int]) -> WeightedSampler:
+        if deleted_phrases:
+            # deleted phrases keep their weights but are never chosen
+            return WeightedSampler([0 if i in deleted_phrases else w for i, w in enumerate(weights)])
+        return WeightedSampler(weights)
+
     def increase_weight(self, index: int):
         """
         increase value of weights at index i
         """
         self.weights[index] += self.reward
+        self.sampler.update(index, self.weights[index])
+        self.changed_weights.add(index)
 
     def decrease_weight(self, index: int):
         """
         increase value of weights at index i
         """
         self.weights[index] = max(1, self.weights[index]-self.reward)
+        self.sampler.update(index, self.weights[index])
+        self.changed_weights.add(index)
+
+    def apply_verdicts(self, indices: Sequence[int], verdicts: Sequence[bool]):
+        """
+        Changes the weights of the phrases at indices as decrease_weight does
+        for correct verdicts and increase_weight for incorrect ones, in order,
+        then rebuilds the sampler and saves the weights once
+        """
+        weights = self.weights
+        reward = self.reward
+        for index, verdict in zip(indices, verdicts):
+            if verdict:
+                weights[index] = max(1, weights[index] - reward)
+            else:
+                weights[index] += reward
+        self.changed_weights.update(indices)
+        self.build_sampler()
+        self.save_weights()
 
     def reset_weights(self):
         """
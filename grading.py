@@ -0,0 +1,363 @@
+"""
+Grades an answer against the truth, both normalised, e.g. by Normalizer.normalize.
+Answers are accepted if their character edit distance from the truth is within a
+threshold. Distances are found by following the diagonals of the edit matrix
+outwards from the fewest edits (Ukkonen, Landau-Vishkin), skipping runs of matching
+text with slice comparisons, so a near answer costs a few operations per edit rather
+than per character. Answers that need many edits fall back to Myers' bit-parallel
+algorithm, a few integer operations per character, which stops once the answer
+can't be within the threshold. Words are aligned the same way to give a diff of
+inserted, deleted and substituted words for feedback.
+"""
+from math import isqrt
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# kinds of edit in a word diff, insert is a word in the answer that isn't in the
+# truth and delete is a word of the truth missing from the answer
+EQUAL = "equal"
+SUBSTITUTE = "substitute"
+INSERT = "insert"
+DELETE = "delete"
+# roughly how many characters the bit-parallel algorithm processes in the time
+# it takes to follow one diagonal one edit further
+DIAGONAL_COST = 1
+# extra diagonals either side of the shortest path searched by the word alignment fallback,
+# answers further off than this still get an alignment, just not always the best
+ALIGNMENT_BAND = 8
+
+Edit = Tuple[str, Optional[str], Optional[str]]
+
+
+def common_length(a: Sequence, b: Sequence, i: int, j: int) -> int:
+    """
+    returns length of the longest common prefix of a[i:] and b[j:]
+    """
+    limit = min(len(a) - i, len(b) - j)
+    if limit <= 0 or a[i] != b[j]:
+        return 0
+    # lengths known to match and known not to, doubled then bisected
+    # so long runs are compared a slice at a time
+    same, size = 1, 2
+    while size <= limit and a[i:i + size] == b[j:j + size]:
+        same, size = size, size * 2
+    differ = min(size, limit + 1)
+    while differ - same > 1:
+        middle = (same + differ) // 2
+        if a[i:i + middle] == b[j:j + middle]:
+            same = middle
+        else:
+            differ = middle
+    return same
+
+
+def diagonal_search(a: Sequence, b: Sequence, limit: int) -> Optional[List[Dict[int, tuple]]]:
+    """
+    Finds the fewest edits turning a into b, if there are at most limit
+    Parameters
+    ----------
+    a: first string or list
+    b: second string or list
+    limit: most edits to search for
+
+    Returns
+    -------
+    None if more than limit edits are needed, otherwise the edit count is the
+    length of the list less one, entry d maps each diagonal j - i reached with d
+    edits to (furthest row i, row before matching items were skipped, edit taken)
+    """
+    m, n = len(a), len(b)
+    target = n - m
+    row = common_length(a, b, 0, 0)
+    fronts = [{0: (row, 0, None)}]
+    if target == 0 and row == m:
+        return fronts
+    for d in range(1, limit + 1):
+        previous = fronts[-1]
+        front = {}
+        # diagonals further from the target than the edits left can't reach it
+        slack = limit - d
+        for k in range(max(-m, -d, target - slack), min(n, d, target + slack) + 1):
+            best, edit = -1, None
+            # substitute, a[i] for b[i + k]
+            reached = previous.get(k)
+            if reached is not None and reached[0] < m and reached[0] + k < n:
+                best, edit = reached[0] + 1, SUBSTITUTE
+            # a[i] isn't in b, from diagonal k + 1
+            reached = previous.get(k + 1)
+            if reached is not None and reached[0] < m and reached[0] + 1 > best:
+                best, edit = reached[0] + 1, INSERT
+            # b[i + k - 1] isn't in a, from diagonal k - 1
+            reached = previous.get(k - 1)
+            if reached is not None and reached[0] + k <= n and reached[0] > best:
+                best, edit = reached[0], DELETE
+            if edit is None:
+                continue
+            row = best
+            if row < m and row + k < n and a[row] == b[row + k]:
+                row += common_length(a, b, row, row + k)
+            front[k] = (row, best, edit)
+        fronts.append(front)
+        reached = front.get(target)
+        if reached is not None and reached[0] == m:
+            return fronts
+    return None
+
+
+def diagonal_edits(a: Sequence, b: Sequence, fronts: List[Dict[int, tuple]]) -> List[Edit]:
+    """
+    returns the edits found by diagonal_search, in order
+    """
+    edits = []
+    k = len(b) - len(a)
+    for d in range(len(fronts) - 1, -1, -1):
+        row, start, edit = fronts[d][k]
+        edits.extend((EQUAL, a[i], b[i + k]) for i in range(row - 1, start - 1, -1))
+        if edit == SUBSTITUTE:
+            edits.append((SUBSTITUTE, a[start - 1], b[start - 1 + k]))
+        elif edit == INSERT:
+            edits.append((INSERT, a[start - 1], None))
+            k += 1
+        elif edit == DELETE:
+            edits.append((DELETE, None, b[start + k - 1]))
+            k -= 1
+    edits.reverse()
+    return edits
+
+
+def diagonal_limit(length: int) -> int:
+    """
+    returns most edits worth searching diagonals for before the
+    bit-parallel algorithm is faster, for strings of length characters
+    """
+    return isqrt(length // DIAGONAL_COST) + 1
+
+
+def char_distance(a: str, b: str, max_distance: int = None) -> int:
+    """
+    Returns Levenshtein distance between a and b
+    Parameters
+    ----------
+    a: first string
+    b: second string
+    max_distance: if given, stops once the distance is known to be larger
+    and returns max_distance + 1
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    if max_distance is not None and len(b) - len(a) > max_distance:
+        return max_distance + 1
+    limit = diagonal_limit(len(b))
+    if max_distance is not None:
+        limit = min(limit, max_distance)
+    fronts = diagonal_search(a, b, limit)
+    if fronts is not None:
+        return len(fronts) - 1
+    if max_distance is not None and max_distance <= limit:
+        return max_distance + 1
+    # matching ends don't change the distance
+    start = common_length(a, b, 0, 0)
+    end = common_length(a[::-1], b[::-1], 0, 0)
+    end = min(end, len(a) - start)
+    return myers_distance(a[start:len(a) - end], b[start:len(b) - end], max_distance)
+
+
+def myers_distance(a: str, b: str, max_distance: int = None) -> int:
+    """
+    Levenshtein distance of a from b, no longer than a, computed a column at a time
+    with the column held as bit vectors of its vertical differences
+    """
+    m, n = len(a), len(b)
+    if m == 0:
+        return n
+    # bit i of peq[c] is set if a[i] == c
+    peq: Dict[str, int] = {}
+    bit = 1
+    for c in a:
+        peq[c] = peq.get(c, 0) | bit
+        bit <<= 1
+    mask = bit - 1
+    last = 1 << (m - 1)
+    # vertical deltas of the current column, +1 and -1
+    pv = mask
+    mv = 0
+    score = m
+    # each character left can lower the distance by at most one
+    give_up = n + max_distance if max_distance is not None else 2 * n + m
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & last:
+            score += 1
+        elif mh & last:
+            score -= 1
+        give_up -= 1
+        if score > give_up:
+            return max_distance + 1
+        ph = ((ph << 1) | 1) & mask
+        pv = ((mh << 1) & mask) | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score
+
+
+def align_words(attempt: List[str], truth: List[str]) -> List[Edit]:
+    """
+    Aligns the words of attempt with the words of truth using the fewest
+    insertions, deletions and substitutions
+    Parameters
+    ----------
+    attempt: words of the answer
+    truth: words of the truth
+
+    Returns
+    -------
+    list of (kind, attempt word, truth word) in order, the attempt word
+    is None for deletions and the truth word None for insertions
+    """
+    fronts = diagonal_search(attempt, truth, diagonal_limit(max(len(attempt), len(truth))))
+    if fronts is not None:
+        return diagonal_edits(attempt, truth, fronts)
+    # matching words at either end need no search
+    start = common_length(attempt, truth, 0, 0)
+    end = common_length(attempt[::-1], truth[::-1], 0, 0)
+    end = min(end, len(attempt) - start, len(truth) - start)
+    end_a, end_t = len(attempt) - end, len(truth) - end
+    middle = banded_alignment(attempt[start:end_a], truth[start:end_t], ALIGNMENT_BAND)
+    return ([(EQUAL, word, word) for word in truth[:start]] + middle
+            + [(EQUAL, word, word) for word in truth[end_t:]])
+
+
+def banded_alignment(attempt: List[str], truth: List[str], band: int) -> List[Edit]:
+    """
+    align_words by dynamic programming over the cells within band of the diagonals between the corners
+    """
+    rows, cols = len(attempt), len(truth)
+    if rows == 0 or cols == 0:
+        return [(INSERT, word, None) for word in attempt] + [(DELETE, None, word) for word in truth]
+    low = min(0, cols - rows) - band
+    high = max(0, cols - rows) + band
+    unreached = rows + cols + 1
+    costs = [[unreached] * (cols + 1) for _ in range(rows + 1)]
+    costs[0][:min(high, cols) + 1] = range(min(high, cols) + 1)
+    for i in range(1, rows + 1):
+        previous = costs[i - 1]
+        current = costs[i]
+        word = attempt[i - 1]
+        first = max(0, i + low)
+        if first == 0:
+            current[0] = i
+            first = 1
+        for j in range(first, min(cols, i + high) + 1):
+            best = previous[j - 1] + (word != truth[j - 1])
+            if previous[j] + 1 < best:
+                best = previous[j] + 1
+            if current[j - 1] + 1 < best:
+                best = current[j - 1] + 1
+            current[j] = best
+
+    edits = []
+    i, j = rows, cols
+    while i > 0 or j > 0:
+        cost = costs[i][j]
+        if i > 0 and j > 0 and costs[i - 1][j - 1] + (attempt[i - 1] != truth[j - 1]) == cost:
+            i -= 1
+            j -= 1
+            edits.append((EQUAL if attempt[i] == truth[j] else SUBSTITUTE, attempt[i], truth[j]))
+        elif i > 0 and costs[i - 1][j] + 1 == cost:
+            i -= 1
+            edits.append((INSERT, attempt[i], None))
+        else:
+            j -= 1
+            edits.append((DELETE, None, truth[j]))
+    edits.reverse()
+    return edits
+
+
+class Grade:
+    """
+    Result of grading an answer, the exact distance of a rejected
+    answer and the word diff are worked out when first used
+    """
+
+    def __init__(self, attempt: str, truth: str, distance: Optional[int], accepted: bool):
+        self.attempt = attempt
+        self.truth = truth
+        self._distance = distance
+        self.accepted = accepted
+        self._diff = None
+
+    @property
+    def distance(self) -> int:
+        """
+        character edits from the answer to the truth
+        """
+        if self._distance is None:
+            self._distance = char_distance(self.attempt, self.truth)
+        return self._distance
+
+    @property
+    def score(self) -> float:
+        """
+        similarity of the answer to the truth from 0 to 1, 1 if they are equal
+        """
+        length = max(len(self.attempt), len(self.truth))
+        return 1.0 if length == 0 else max(0.0, 1 - self.distance / length)
+
+    @property
+    def diff(self) -> List[Edit]:
+        """
+        word alignment of the answer with the truth, see align_words
+        """
+        if self._diff is None:
+            self._diff = align_words(self.attempt.split(), self.truth.split())
+        return self._diff
+
+
+class Grader:
+    """
+    Accepts answers whose score is at least threshold, set under
+    "grading" "threshold" in config.json, 1 accepts exact matches only
+    """
+
+    def __init__(self, threshold: float = 1.0):
+        self.threshold = threshold
+
+    def max_distance(self, attempt: str, truth: str) -> int:
+        """
+        returns most character edits an answer may have and still be accepted
+        """
+        # with a little slack so e.g. 0.9 of 10 characters allows 1 edit
+        return max(0, int((1 - self.threshold) * max(len(attempt), len(truth)) + 1e-9))
+
+    def accepts(self, attempt: str, truth: str) -> bool:
+        if attempt == truth:
+            return True
+        max_distance = self.max_distance(attempt, truth)
+        return max_distance > 0 and char_distance(attempt, truth, max_distance) <= max_distance
+
+    def grade(self, attempt: str, truth: str) -> Grade:
+        """
+        grades normalised attempt against normalised truth
+        """
+        if attempt == truth:
+            return Grade(attempt, truth, 0, True)
+        max_distance = self.max_distance(attempt, truth)
+        distance = char_distance(attempt, truth, max_distance)
+        if distance > max_distance:
+            # grading stopped early, the exact distance is only worked out if asked for
+            return Grade(attempt, truth, None, False)
+        return Grade(attempt, truth, distance, True)
+
+
+def grade_chunk(normalizer, grader: Grader, answers: List[str], truths: List[str]) -> List[bool]:
+    """
+    Normalises answers, as typed, together and returns whether each is accepted
+    against the normalised truth at the same position, run in worker
+    processes by Game.grade_batch so it is a module level function
+    """
+    normalized = normalizer.normalize_many(answers)
+    if grader.threshold >= 1:
+        return list(map(str.__eq__, normalized, truths))
+    return list(map(grader.accepts, normalized, truths))
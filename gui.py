@@ -1,25 +1,37 @@
+from __future__ import annotations
+
+import csv
 import os
+import queue
+from concurrent.futures import Future
 from abc import ABC
-from typing import List
-import matplotlib
-from PyQt5.QtCore import Qt, QThreadPool
+from typing import List, Set, TYPE_CHECKING
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont, QIcon, QBrush, QPen, QColor
 from PyQt5.QtWidgets import (QApplication, QMainWindow,
                              QLabel, QTextEdit, QPushButton,
                              QWidget, QHBoxLayout, QVBoxLayout,
                              QAction, QStatusBar, QMessageBox, QGraphicsScene,
-                             QGraphicsEllipseItem, QGraphicsView, )
+                             QGraphicsEllipseItem, QGraphicsView, QFileDialog,
+                             QInputDialog, )
 
 from add_content.add_phrases import AddPhraseWindow
 from add_content.add_category import AddCategoryWindow
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
-from matplotlib.figure import Figure
+from add_content.importer import ImportReport, import_phrases, read_rows, valid_category_name
+from add_content.phrase_index import INDEXES
+from category_cache import CachedCategory, CategoryCache
 
 from config import Config
 from game import Game
-from threads import Worker
+from phrase_journal import phrase_journal
+from playback import PlaybackEngine
+from threads import TaskExecutor
+from watcher import AssetWatcher, Changes
 
-matplotlib.use('Qt5Agg')
+if TYPE_CHECKING:
+    # numpy and bullseye.py, which needs numpy, are imported once the first phrase is shown
+    import numpy as np
+    from bullseye import DensityLayer
 
 
 class InputBox(QTextEdit):
@@ -45,12 +57,11 @@ class InputBox(QTextEdit):
             self.s.on_submit()
 
 
-class MplCanvas(FigureCanvasQTAgg):
-
-    def __init__(self, parent=None, width=5, height=4, dpi=100):
-        fig = Figure(figsize=(width, height), dpi=dpi)
-        self.axes = fig.add_subplot(111)
-        super(MplCanvas, self).__init__(fig)
+class ImportSignals(QObject):
+    """
+    Progress of an import running on a worker thread, delivered on the gui thread
+    """
+    progress = pyqtSignal(str)
 
 
 class GUI(Game, QMainWindow):
@@ -60,22 +71,23 @@ class GUI(Game, QMainWindow):
         Game.__init__(self, phrases_category, config)
         QMainWindow.__init__(self)
 
-        self.sound_thread = QThreadPool()
-
-        self.load_phrases()
+        playback = self.config.params.get("playback", {})
+        # owns the audio device for as long as the app runs
+        self.playback = PlaybackEngine(int(playback.get("cache-mb", 64) * 1024 * 1024))
+        # blocking work runs on these, results are handed back on the gui thread
+        self.tasks = TaskExecutor("gui-tasks", workers=2, max_queue=16)
+        # future of the category being loaded to switch to, None once it is shown
+        self.loading_category = None
+        # writes to the categories run one at a time so they never interleave
+        self.disk_tasks = TaskExecutor("disk-tasks", workers=1, max_queue=16)
+        self.import_signals = ImportSignals()
+        self.import_signals.progress.connect(self.update_feedback)
 
         w = QWidget()
         vertical_layout = QVBoxLayout()
         layout_graph = QHBoxLayout()
         horizontal_layout = QHBoxLayout()
 
-        self.processed_swedish_with_accents = None
-        self.processed_answer = None
-        self.processed_swedish_no_accents = None
-        self.phrases_category = phrases_category
-        self.load_phrases()
-        self.load_weights()
-
         self.phrase_category_label = QLabel(self)
         self.statusBar = QStatusBar()
         self.setStatusBar(self.statusBar)
@@ -102,8 +114,13 @@ class GUI(Game, QMainWindow):
         bullseye_radii = [self.bullseye_radius, 70, 50, 30, 10]
 
         self.bullseye_items = []
+        self.bullseye_coords = None
         self.bullseye_scene = self.create_bullseye(self.bullseye_scene, bulllseye_fills, bullseye_radii,
                                                    self.graphics_height)
+        # above this many phrases points are drawn as a heatmap instead of one item each
+        self.bullseye_point_limit = self.config.params["graph"].get("bullseye-point-limit", 2000)
+        # created the first time a category is too big to draw point by point
+        self.density_layer = None
         view = QGraphicsView(self.bullseye_scene)
         view.show()
         layout_graph.addWidget(view)
@@ -150,26 +167,22 @@ class GUI(Game, QMainWindow):
         self.setCentralWidget(w)
 
         menu = self.menuBar()
-        categories_menu = menu.addMenu("Categories")
+        self.categories_menu = menu.addMenu("Categories")
         settings_menu = menu.addMenu("Settings")
 
-        for category in self.config.params["phrase-categories"]:
-            action = QAction(category, self)
-            action.triggered.connect(self.on_category_selection)
-            categories_menu.addAction(action)
-            categories_menu.addSeparator()
-
         font1 = QAction("Font: +", self)
         font2 = QAction("Font: -", self)
         reset_weights = QAction("Reset weights", self)
         add_phrases = QAction("Add phrase(s)", self)
         add_category = QAction("Add Category", self)
+        import_phrases = QAction("Import phrases", self)
 
         font1.triggered.connect(self.on_increase_font)
         font2.triggered.connect(self.on_decrease_font)
         reset_weights.triggered.connect(self.on_reset)
         add_phrases.triggered.connect(self.on_add_phrase)
         add_category.triggered.connect(self.on_add_category)
+        import_phrases.triggered.connect(self.on_import)
 
         settings_menu.addAction(font1)
         settings_menu.addSeparator()
@@ -177,26 +190,94 @@ class GUI(Game, QMainWindow):
         settings_menu.addSeparator()
         settings_menu.addAction(reset_weights)
         settings_menu.addSeparator()
-        add_phrase = settings_menu.addMenu("Add phrase")
+        self.add_phrase_menu = settings_menu.addMenu("Add phrase")
         settings_menu.addSeparator()
         settings_menu.addAction(add_category)
+        settings_menu.addSeparator()
+        settings_menu.addAction(import_phrases)
 
+        # category -> its actions and separators in the Categories and Add phrase menus
+        self.category_actions = {}
         for category in self.config.params["phrase-categories"]:
-            action = QAction(category, self)
-            action.triggered.connect(self.on_add_phrase)
-            add_phrase.addAction(action)
-            add_phrase.addSeparator()
+            self.add_category_actions(category)
 
         self.popup = QMessageBox()
 
+        # config.json and assets are polled so new content shows up without a restart
+        self.watcher = AssetWatcher(self.config.filepath)
+        self.watch_timer = QTimer(self)
+        self.watch_timer.timeout.connect(self.check_for_changes)
+        self.watch_timer.start(int(1000 * self.config.params.get("watch-interval", 1.0)))
+
         self.setFixedSize(1000, 500)
-        self.initialise_category()
-        self.new_phrase()
+        cache = self.config.params.get("category-cache", {})
+        self.category_cache = CategoryCache(self.read_category, self.on_evict_category,
+                                            int(cache.get("max-mb", 256) * 1024 * 1024),
+                                            preload=self.preload_category)
+        self.preload_count = cache.get("preload", 2)
+        # categories practised, most recent last
+        self.category_history = []
+        # the bullseye is drawn once the window is up so the first phrase shows sooner
+        self.initialise_category(defer_graphic=True)
         self.key_press_num = 0
 
     def reset_config(self):
-        print(
-            "implement resetting of config and call when user adds new category so ne content is immediately available")
+        """
+        Applies changes to config.json and the categories in assets straight away
+        instead of waiting for the next poll, e.g. after adding a category
+        """
+        self.apply_changes(self.watcher.poll())
+
+    def check_for_changes(self):
+        changes = self.watcher.poll()
+        if changes:
+            self.apply_changes(changes)
+
+    def apply_changes(self, changes: Changes):
+        """
+        Updates only the menu entries and cached phrases of the categories that changed
+        """
+        for category in changes.removed + changes.changed:
+            self.category_cache.discard(category)
+        if changes.config:
+            self.apply_config(self.config.reload())
+        categories = self.config.params["phrase-categories"]
+        for category in changes.added:
+            if category not in categories:
+                categories.append(category)
+            if category not in self.category_actions:
+                self.add_category_actions(category)
+        for category in changes.removed:
+            if category in categories:
+                categories.remove(category)
+            self.remove_category_actions(category)
+            INDEXES.pop(category, None)
+            phrase_journal(category).invalidate()
+            if category == self.phrases_category:
+                self.update_feedback(f"category {category} was removed, its phrases are kept until another is chosen")
+        for category in changes.changed:
+            phrase_journal(category).invalidate()
+            if category == self.phrases_category and self.reload_phrases():
+                self.reset_graphic()
+
+    def apply_config(self, changed: Set[str]):
+        Game.apply_config(self, changed)
+        if "aesthetics" in changed:
+            self.set_font_size(self.input_box)
+            self.set_font_size(self.phrase)
+            self.set_font_size(self.feedback)
+        if "graph" in changed:
+            self.bullseye_point_limit = self.config.params["graph"].get("bullseye-point-limit", 2000)
+            self.reset_graphic()
+        if changed & {"accents-lookup", "unicode-folding"}:
+            # normalised phrases of cached categories are out of date
+            self.category_cache.clear()
+        if "category-cache" in changed:
+            cache = self.config.params.get("category-cache", {})
+            self.category_cache.max_bytes = int(cache.get("max-mb", 256) * 1024 * 1024)
+            self.preload_count = cache.get("preload", 2)
+        if "watch-interval" in changed:
+            self.watch_timer.setInterval(int(1000 * self.config.params.get("watch-interval", 1.0)))
 
     def keyPressEvent(self, event):
         # if event.key() == Qt.Key_Space:
@@ -241,13 +322,13 @@ class GUI(Game, QMainWindow):
         return scene
 
     def initialise_bullseye_coords(self,
-                                   coords: List[List[int]],
+                                   coords: np.ndarray,
                                    graphics_height: int):
         """
         Initialise the pointson the bullseye graphic
         Parameters
         ----------
-        coords: list of corrdinates of points
+        coords: array of corrdinates of points
         graphics_height: height of graphic
         """
         for i in self.bullseye_items:
@@ -257,7 +338,9 @@ class GUI(Game, QMainWindow):
         for c in coords:
             b = QBrush(QColor(255, 255, 255))
 
-            g = QGraphicsEllipseItem(c[0] + (graphics_height / 2) - 2.5, c[1] + (graphics_height / 2) - 2.5, 5, 5)
+            # point is drawn centred on the bullseye then moved to its coordinate with setPos
+            g = QGraphicsEllipseItem((graphics_height / 2) - 2.5, (graphics_height / 2) - 2.5, 5, 5)
+            g.setPos(int(c[0]), int(c[1]))
 
             g.setBrush(b)
 
@@ -265,16 +348,18 @@ class GUI(Game, QMainWindow):
             self.bullseye_scene.addItem(g)
 
     def update_bullseye_coords(self,
-                               coords: List[List[int]]
+                               coords: np.ndarray,
+                               indices: List[int]
                                ):
         """
         Updates point son bullseye graphic
         Parameters
         ----------
-        coordsL list of new coordinates
+        coords: array of coordinates of all points
+        indices: indices of the points that have moved
         """
-        for c, item in zip(coords, self.bullseye_items):
-            item.setPos(c[0], c[1])
+        for i in indices:
+            self.bullseye_items[i].setPos(int(coords[i, 0]), int(coords[i, 1]))
 
     def on_increase_font(self):
         """
@@ -311,13 +396,79 @@ class GUI(Game, QMainWindow):
 
     def on_category_selection(self):
         """
-        Method executed when category selected
+        Method executed when category selected, the category is loaded on a task
+        thread, unless it is cached, while the current one can still be practised
         """
-        self.phrases_category = self.sender().text()
-        self.initialise_category()
+        category = self.sender().text()
+        if category == self.phrases_category:
+            self.update_popup_text(f"changed category to: {str(self.phrases_category)}")
+            self.popup.exec()
+            return
+        # only the category chosen last is switched to, one still loading goes back in the cache
+        if self.tasks.cancel("category") and self.loading_category is not None:
+            self.loading_category.add_done_callback(self.return_category)
+        self.update_feedback(f"loading {category}")
+        self.loading_category = self.tasks.submit(self.category_cache.take, category, tag="category",
+                                                  on_done=self.on_category_loaded)
+
+    def return_category(self, future: Future):
+        """
+        puts a category taken from the cache but never switched to back in it, with its loaded weights
+        """
+        if not future.cancelled() and future.exception() is None:
+            self.category_cache.put(future.result())
+
+    def on_category_loaded(self, future: Future):
+        self.loading_category = None
+        try:
+            cached = future.result()
+        except (OSError, ValueError, KeyError) as e:
+            self.update_feedback(f"couldnt load category: {str(e)}")
+            return
+        self.stash_category()
+        self.initialise_category(cached=cached)
+        self.update_feedback("")
         self.update_popup_text(f"changed category to: {str(self.phrases_category)}")
         self.popup.exec()
 
+    def stash_category(self):
+        """
+        keeps the category being practised in the category cache so switching back to it is instant
+        """
+        self.save_weights()
+        cached = self.cached_category()
+        if not self.changed_weights:
+            cached.bullseye_coords = self.bullseye_coords
+        self.category_cache.put(cached)
+
+    def preload_category(self, category: str) -> CachedCategory:
+        """
+        reads category on the preload thread, working out its bullseye coordinates as well
+        """
+        cached = self.read_category(category)
+        cached.bullseye_coords = self.polar_coordinates_to_cartesian(cached.weights, 10, 1, self.bullseye_radius)
+        return cached
+
+    def on_evict_category(self, cached: CachedCategory):
+        # weights are saved as they change, make sure the last save is on disk before the category is dropped
+        self.weights_writer.flush(os.path.join("assets", cached.category, "weights.json"))
+
+    def likely_categories(self) -> List[str]:
+        """
+        returns the categories most likely to be chosen next, the most recently
+        practised first then the neighbours of the current category in the menu
+        """
+        categories = [c for c in self.config.params["phrase-categories"] if c in self.watcher.categories]
+        likely = [c for c in reversed(self.category_history) if c in categories]
+        if self.phrases_category in categories:
+            i = categories.index(self.phrases_category)
+            likely += categories[i + 1:i + 2] + categories[max(i - 1, 0):i]
+        likely = [c for c in dict.fromkeys(likely) if c != self.phrases_category]
+        return likely[:self.preload_count]
+
+    def preload_categories(self):
+        self.category_cache.preload(self.likely_categories())
+
     def on_add_phrase(self):
         """
         Method executed when phrase added
@@ -330,6 +481,71 @@ class GUI(Game, QMainWindow):
         self.new_phrase_window = AddPhraseWindow(self, selected_category)
         self.new_phrase_window.show()
 
+    def add_category_actions(self, category: str):
+        """
+        Adds category to the Categories and Add phrase menus
+        """
+        select = QAction(category, self)
+        select.triggered.connect(self.on_category_selection)
+        self.categories_menu.addAction(select)
+        select_separator = self.categories_menu.addSeparator()
+
+        add_phrase = QAction(category, self)
+        add_phrase.triggered.connect(self.on_add_phrase)
+        self.add_phrase_menu.addAction(add_phrase)
+        add_phrase_separator = self.add_phrase_menu.addSeparator()
+        self.category_actions[category] = [(self.categories_menu, select),
+                                           (self.categories_menu, select_separator),
+                                           (self.add_phrase_menu, add_phrase),
+                                           (self.add_phrase_menu, add_phrase_separator)]
+
+    def remove_category_actions(self, category: str):
+        """
+        Removes category from the Categories and Add phrase menus
+        """
+        for menu, action in self.category_actions.pop(category, []):
+            menu.removeAction(action)
+            action.deleteLater()
+
+    def on_import(self):
+        """
+        Method executed when importing phrases from a file, the import runs on a seperate thread
+        """
+        path, _ = QFileDialog.getOpenFileName(self, "Import phrases", "",
+                                              "Phrase files (*.tsv *.csv *.txt);;All files (*)")
+        if not path:
+            return
+        default_category = os.path.splitext(os.path.basename(path))[0]
+        category, ok = QInputDialog.getText(self, "Import phrases", "category to import into",
+                                            text=default_category)
+        if not ok or not category:
+            return
+        if not valid_category_name(category):
+            self.update_feedback(f"invalid category name {category}, it can't be '.', '..' or contain a path separator")
+            return
+        self.update_feedback(f"importing {os.path.basename(path)} into {category}")
+        try:
+            self.disk_tasks.submit(self.import_phrases, path, category, block=False,
+                                   on_done=lambda future: self.on_import_finished(path, category, future))
+        except queue.Full:
+            self.update_feedback("too many imports waiting, try again once they have finished")
+
+    def import_phrases(self, path: str, category: str) -> ImportReport:
+        """
+        Imports phrases from file at path into category, runs on a disk task thread
+        """
+        return import_phrases(read_rows(path), category, self.preprocess,
+                              progress=self.import_signals.progress.emit)
+
+    def on_import_finished(self, path: str, category: str, future: Future):
+        try:
+            message = f"imported into {category}: {future.result()}"
+        except (OSError, ValueError, csv.Error) as e:
+            message = f"couldnt import {path}: {str(e)}"
+        self.reset_config()
+        self.update_popup_text(message)
+        self.popup.exec()
+
     def on_add_category(self):
         """
         Method executed when new category added,
@@ -351,37 +567,35 @@ class GUI(Game, QMainWindow):
         except AttributeError as e:
             print(f"couldnt set font type for {str(widget)}")
 
-    def initialise_category(self):
-        """
-        loads phrases and weights,
-        checks weights are as expected given the phrases
-        updates graphics
-        """
-        self.load_phrases()
-        load_weights = self.load_weights()
-        if not load_weights or len(self.weights) != len(self.syntax):
-            self.reset_weights()
-        self.reset_graphic()
-        self.new_phrase()
-        self.phrase_category_label.setText(f"category: {self.phrases_category}")
-
-    def increase_weight(self, index: int):
-        """
-        Increase weight of specific phrase
-        Parameters
-        ----------
-        index; index of phrase
-        """
-        self.weights[index] += self.reward
-
-    def decrease_weight(self, index: int):
+    def initialise_category(self, defer_graphic: bool = False, cached: CachedCategory = None):
         """
-        Decrease weight of specific phrase
+        loads phrases and weights, from the category cache if the category has
+        been practised or preloaded, and updates graphics
         Parameters
         ----------
-        index; index of phrase
-        """
-        self.weights[index] = max(1, self.weights[index] - self.reward)
+        defer_graphic: if True the bullseye is drawn once the event loop runs, after the phrase is shown
+        cached: category to switch to, already taken from the category cache, phrases_category if not given
+        """
+        self.playback.stop()
+        self.tasks.cancel("audio")
+        if cached is None:
+            cached = self.category_cache.take(self.phrases_category)
+        self.use_category(cached)
+        if self.phrases_category in self.category_history:
+            self.category_history.remove(self.phrases_category)
+        self.category_history.append(self.phrases_category)
+        self.new_phrase()
+        self.phrase_category_label.setText(f"category: {self.phrases_category}")
+        coords = cached.bullseye_coords
+        if coords is not None and len(coords) != len(self.weights):
+            coords = None
+        if defer_graphic:
+            self.bullseye_coords = None
+            QTimer.singleShot(0, lambda: self.reset_graphic(coords))
+        else:
+            self.reset_graphic(coords)
+        # after the graphic, so loading other categories doesn't hold it up
+        QTimer.singleShot(0, self.preload_categories)
 
     def update_feedback(self, message: str, bold: bool = False, color: str="black"):
         """
@@ -434,31 +648,29 @@ class GUI(Game, QMainWindow):
 
     def on_audio(self):
         """
-        Uses current phrase index and searches relevant audio folde for matching file,
-        this method is required because the file ending is unkown
+        Plays audio of the current phrase, synthesising it first if it has no audio file
         """
         number_file = self.selected_index
-        audio_file = None
-
-        audio_folder = os.path.join("assets", self.phrases_category, "audio")
-        if os.path.isdir(audio_folder):
-            relevant_audio_files = os.listdir(audio_folder)
-            for f in relevant_audio_files:
-                if str(number_file) == f.split(".")[0]:
-                    audio_file = f
-                    break
-            if audio_file is None:
-                audio_path = os.path.join(audio_folder, f"{str(number_file)}.mp3")
-                ret = self.get_external_audio(audio_path, self.language2)
-                if not ret:
-                    return None
-            else:
-                audio_path = os.path.join(audio_folder, audio_file)
-            # run function on seperate thread from gui thread
-            worker = Worker(self.play_phrase, audio_path)
-            self.sound_thread.start(worker)
-        else:
-            return None
+        audio_path = self.find_audio(number_file)
+        # audio asked for earlier that isn't ready yet is replaced
+        self.tasks.cancel("audio")
+        if audio_path is None:
+            # synthesised on the prefetch threads, played once it is ready
+            self.tasks.watch(self.synthesize_audio(number_file, self.language2),
+                             lambda future: self.on_audio_synthesized(number_file, future), tag="audio")
+            return
+        # played on the playback thread, replacing any clip still playing
+        self.playback.play(audio_path)
+
+    def on_audio_synthesized(self, index: int, future: Future):
+        audio_path = self.find_audio(index) if future.result() else None
+        if audio_path is None:
+            self.update_feedback("audio could not be synthesised")
+            return
+        self.playback.play(audio_path)
+
+    def preload_audio(self, path: str):
+        self.playback.preload(path)
 
     def on_skip(self):
         """
@@ -468,6 +680,8 @@ class GUI(Game, QMainWindow):
         self.increase_weight(self.selected_index)
         self.save_weights()
         self.update_graphic()
+        self.playback.stop()
+        self.tasks.cancel("audio")
         self.new_phrase()
         self.update_feedback("")
 
@@ -477,16 +691,13 @@ class GUI(Game, QMainWindow):
         """
         answer = self.input_box.toPlainText()
         self.input_box.setText("")
-        self.processed_answer = self.preprocess(answer)
-        self.processed_swedish_with_accents = self.preprocess(self.language2)
-        self.processed_swedish_no_accents = self.replace_accents(self.processed_swedish_with_accents)
 
-        if self.processed_answer == self.processed_swedish_no_accents:
+        if self.check_answer(answer):
             self.correct()
             self.on_audio()
             self.tries = 0
             self.new_phrase()
-        elif self.processed_answer != self.processed_swedish_no_accents:
+        else:
             self.incorrect()
             self.tries += 1
 
@@ -523,40 +734,80 @@ class GUI(Game, QMainWindow):
     def reset_weights(self):
 
         self.weights = len(self.syntax) * [1]
+        self.build_sampler()
         self.save_weights()
 
     def run(self):
 
-        ret = self.load_weights()
-        if not ret:
-            self.reset_weights()
         self.show()
         self.app.exec()
+        self.category_cache.shutdown()
+        self.playback.shutdown()
+        print(f"audio playback: {self.playback.report()}")
+        print(self.tasks.report())
+        print(self.disk_tasks.report())
+        self.tasks.shutdown()
+        self.disk_tasks.shutdown()
+        self.weights_writer.close()
+        self.audio_prefetcher.shutdown()
+
+    def use_density_layer(self) -> bool:
+        """
+        returns True if the bullseye points are drawn as a heatmap
+        """
+        return len(self.weights) > self.bullseye_point_limit
 
-    def reset_graphic(self):
-        coords = self.get_bullseye_coords()
-        self.initialise_bullseye_coords(coords, self.graphics_height)
+    def reset_graphic(self, bullseye_coords: np.ndarray = None):
+        """
+        Draws every point on the bullseye
+        Parameters
+        ----------
+        bullseye_coords: coordinates of the points if they are already known, worked out from the weights if not
+        """
+        import numpy as np
+
+        self.changed_weights.clear()
+        self.bullseye_coords = self.get_bullseye_coords() if bullseye_coords is None else bullseye_coords
+        if self.use_density_layer():
+            if self.density_layer is None:
+                from bullseye import DensityLayer
+                self.density_layer = DensityLayer(self.bullseye_scene, self.graphics_height)
+            self.initialise_bullseye_coords(np.empty((0, 2), dtype=int), self.graphics_height)
+            self.density_layer.set_points(self.bullseye_coords)
+        else:
+            if self.density_layer is not None:
+                self.density_layer.hide()
+            self.initialise_bullseye_coords(self.bullseye_coords, self.graphics_height)
 
     def update_graphic(self):
 
         """
-        Updates graphic showing wieghts
-        """
-        coords = self.get_bullseye_coords()
-        self.update_bullseye_coords(coords)
+        Updates graphic showing wieghts, only the points of phrases
+        whose weight changed since the last update are moved
+        """
+        if self.bullseye_coords is None:
+            # not drawn yet, reset_graphic will draw the current weights
+            return
+        indices = list(self.changed_weights)
+        self.changed_weights.clear()
+        old_coords = self.bullseye_coords[indices]
+        self.update_cartesian_coordinates(self.bullseye_coords,
+                                          self.weights,
+                                          indices,
+                                          10,
+                                          1,
+                                          self.bullseye_radius)
+        if self.use_density_layer():
+            self.density_layer.move_points(old_coords, self.bullseye_coords[indices])
+        else:
+            self.update_bullseye_coords(self.bullseye_coords, indices)
 
-    def get_bullseye_coords(self):
+    def get_bullseye_coords(self) -> np.ndarray:
 
-        coords = []
-        for weight_index in range(len(self.weights)):
-            _coords = self.polar_coordinate_to_cartesian(len(self.weights),
-                                                         weight_index,
-                                                         self.weights[weight_index],
-                                                         10,
-                                                         1,
-                                                         self.bullseye_radius)
-            coords.append(_coords)
-        return coords
+        return self.polar_coordinates_to_cartesian(self.weights,
+                                                   10,
+                                                   1,
+                                                   self.bullseye_radius)
 
 
 if __name__ == "__main__":
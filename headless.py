@@ -0,0 +1,173 @@
+from collections import deque
+from typing import List
+
+from category_pack import CategoryPack
+from config import Config
+from game import Game
+from profiles import ProfileStore
+
+
+class HeadlessGame(Game):
+    """
+    Game without a user interface, feedback is kept in memory so the answer
+    loop can be driven from code, e.g. by simulate.py or a server
+    """
+
+    def __init__(self,
+                 phrases_category: str,
+                 config: Config,
+                 syntax: list = None,
+                 weights: List[float] = None,
+                 normalized_truths: dict = None,
+                 shared: Game = None,
+                 pack: CategoryPack = None,
+                 persist: bool = False,
+                 weights_path: str = None,
+                 profiles: ProfileStore = None,
+                 learner: str = None,
+                 **kwargs):
+        """
+        Parameters
+        ----------
+        phrases_category: category of phrases to ask
+        config: configuration
+        syntax: phrases to ask, loaded from the category if not given
+        weights: initial weights, loaded from the category if not given
+        normalized_truths: cache of normalised phrases, pass the same dict to games
+        sharing syntax so each phrase is only normalised once
+        shared: game that has already loaded the category, its phrases, pack,
+        normalised phrases and audio index are shared instead of loaded again
+        pack: category pack to read phrases from instead of the category's files,
+        e.g. one in shared memory
+        persist: if False weights are only held in memory
+        weights_path: where weights are saved, defaults to the category's weights.json
+        profiles: store to save weights in instead of a json file, with persist
+        learner: id of the learner in profiles
+        kwargs: passed to Game
+        """
+        Game.__init__(self, phrases_category, config, **kwargs)
+        self.persist = persist
+        self.custom_weights_path = weights_path
+        self.profiles = profiles
+        self.learner = learner
+        # most recent feedback messages, oldest first
+        self.messages = deque(maxlen=100)
+        self.phrase = ""
+        self.input = ""
+        self.tries = 0
+
+        if shared is not None:
+            self.syntax = shared.syntax
+            self.pack = shared.pack
+            self.normalized_truths = shared.normalized_truths
+            self.audio_index = shared.audio_index
+            self.deleted_phrases = shared.deleted_phrases
+        elif syntax is None:
+            self.load_phrases(pack)
+        else:
+            self.syntax = syntax
+        if normalized_truths is not None:
+            self.normalized_truths = normalized_truths
+
+        if weights is not None:
+            self.weights = list(weights)
+            self.build_sampler()
+        elif not (self.persist and self.load_weights()) or len(self.weights) != len(self.syntax):
+            self.reset_weights()
+        self.new_phrase()
+
+    def weights_path(self) -> str:
+        if self.custom_weights_path is not None:
+            return self.custom_weights_path
+        return Game.weights_path(self)
+
+    def load_weights(self) -> bool:
+        if self.profiles is None:
+            return Game.load_weights(self)
+        weights = self.profiles.load(self.learner, self.phrases_category)
+        if weights is not None:
+            self.weights = weights
+            self.extend_weights()
+        elif self.pack is not None:
+            self.weights = self.pack.weights()
+        else:
+            return False
+        self.build_sampler()
+        return True
+
+    def save_weights(self):
+        if not self.persist:
+            return
+        if self.profiles is not None:
+            self.profiles.save(self.learner, self.phrases_category, self.weights)
+        else:
+            Game.save_weights(self)
+
+    def prefetch_audio(self):
+        pass
+
+    def submit(self, answer: str) -> bool:
+        """
+        Submits answer to the phrase being asked, moving on to a new
+        phrase if it was correct, returns True if it was correct
+        """
+        self.update_input("")
+        if self.check_answer(answer):
+            self.correct()
+            self.tries = 0
+            self.new_phrase()
+            return True
+        self.incorrect()
+        self.tries += 1
+        return False
+
+    def correct(self):
+        self.update_feedback(f"{self.phrase}: {self.processed_swedish_with_accents}")
+        self.decrease_weight(self.selected_index)
+        self.update_graphic()
+        self.save_weights()
+
+    def incorrect(self):
+        self.update_feedback(self.uppercase_incorrect_words(self.processed_answer,
+                                                            self.processed_swedish_with_accents))
+        self.increase_weight(self.selected_index)
+        self.save_weights()
+        self.update_graphic()
+
+    def on_peek(self):
+        self.increase_weight(self.selected_index)
+        self.save_weights()
+        self.update_graphic()
+        self.update_feedback(self.language2)
+
+    def on_skip(self):
+        self.update_input("")
+        self.increase_weight(self.selected_index)
+        self.save_weights()
+        self.update_graphic()
+        self.new_phrase()
+        self.update_feedback("")
+
+    def on_reset(self):
+        self.reset_weights()
+        self.update_feedback("weights were reset")
+
+    def on_audio(self):
+        pass
+
+    def reset_weights(self):
+        self.weights = len(self.syntax) * [1]
+        self.build_sampler()
+        self.save_weights()
+
+    def update_feedback(self, message: str):
+        self.messages.append(message)
+
+    def update_phrase(self, message: str):
+        self.phrase = message
+
+    def update_input(self, message: str):
+        self.input = message
+
+    def update_graphic(self):
+        self.changed_weights.clear()
@@ -0,0 +1,190 @@
+"""
+Load test for server.py, simulates many learners answering concurrently over
+keep-alive connections and reports requests per second and latency percentiles,
+e.g. with the server running:
+    python load_test.py --learners 500 --answers 20
+or against a server started on a synthetic category:
+    python load_test.py --self-host --phrases 10000 --workers 8 --processes 8
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.parse import quote_plus
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+INPUT = re.compile(r"<p> (.*?)</p>")
+
+
+class Client:
+    """
+    One learner, keeps a connection and the learner cookie between requests
+    """
+
+    def __init__(self, host: str, port: int, latencies: list, category: str = None):
+        self.host = host
+        self.port = port
+        self.latencies = latencies
+        self.category = category
+        self.cookie = None
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b"") -> tuple:
+        """
+        returns (status, body) of response
+        """
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        headers = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(body)}"]
+        if self.cookie is not None:
+            headers.append(f"Cookie: {self.cookie}")
+        if body:
+            headers.append("Content-Type: application/x-www-form-urlencoded")
+        start = time.perf_counter()
+        self.writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + body)
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.decode("latin-1").split("\r\n")[1:]:
+            k, _, v = line.partition(":")
+            if k.lower() == "content-length":
+                length = int(v)
+            elif k.lower() == "set-cookie":
+                self.cookie = v.strip().split(";")[0]
+        data = await self.reader.readexactly(length)
+        self.latencies.append(time.perf_counter() - start)
+        return status, data
+
+    async def run(self, answers: int, accuracy: float):
+        path = "/" if self.category is None else f"/?category={quote_plus(self.category)}"
+        status, page = await self.request("GET", path)
+        for _ in range(answers):
+            if random.random() < accuracy:
+                # peek gets the answer into the feedback
+                await self.request("GET", "/peek")
+                status, page = await self.request("GET", "/")
+                answer = INPUT.findall(page.decode("utf-8"))[1]
+            else:
+                answer = "fel svar"
+            await self.request("POST", "/submit", f"user_input={quote_plus(answer)}".encode("utf-8"))
+            await self.request("GET", "/")
+        self.writer.close()
+
+
+def percentile(values: list, p: float) -> float:
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+async def learners(args, port: int, count: int) -> tuple:
+    """
+    runs count learners against the server, returns (latencies, errors)
+    """
+    latencies = []
+    clients = [Client(args.host, port, latencies, args.category) for _ in range(count)]
+    results = await asyncio.gather(*[c.run(args.answers, args.accuracy) for c in clients], return_exceptions=True)
+    return latencies, [repr(r) for r in results if isinstance(r, Exception)]
+
+
+def learners_process(args, port: int, count: int) -> tuple:
+    return asyncio.run(learners(args, port, count))
+
+
+def run(args, port: int):
+    start = time.perf_counter()
+    if args.processes > 1:
+        # one client process can't keep a multi-process server busy
+        counts = [args.learners // args.processes + (i < args.learners % args.processes)
+                  for i in range(args.processes)]
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.starmap(learners_process, [(args, port, count) for count in counts])
+        latencies = [t for result in results for t in result[0]]
+        errors = [e for result in results for e in result[1]]
+    else:
+        latencies, errors = learners_process(args, port, args.learners)
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{args.learners} learners, {len(latencies)} requests in {elapsed:.2f}s, "
+          f"{len(latencies) / elapsed:.0f} requests/s, {len(errors)} failed learners")
+    if latencies:
+        print("latency ms " + ", ".join(f"p{p}={1000 * percentile(latencies, p):.2f}" for p in [50, 90, 99, 100]))
+    if errors:
+        print(f"first error: {errors[0]}")
+
+
+def wait_for_port(host: str, port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection((host, port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def self_hosted(args):
+    """
+    runs the server in a subprocess, with --workers processes, and load tests it
+    """
+    server = subprocess.Popen([sys.executable, os.path.join(ROOT, "server.py"),
+                               "--host", args.host,
+                               "--port", str(args.port),
+                               "--category", args.category,
+                               "--workers", str(args.workers)])
+    try:
+        wait_for_port(args.host, args.port)
+        run(args, args.port)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="load test the pyLingo server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--learners", type=int, default=200, help="concurrent learners")
+    parser.add_argument("--answers", type=int, default=20, help="answers per learner")
+    parser.add_argument("--accuracy", type=float, default=0.7, help="fraction of answers that are correct")
+    parser.add_argument("--category", default=None, help="category learners use, default is the server's")
+    parser.add_argument("--processes", type=int, default=1, help="client processes the learners are split over")
+    parser.add_argument("--self-host", action="store_true",
+                        help="start a server on a temporary synthetic category")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes of the server with --self-host")
+    parser.add_argument("--phrases", type=int, default=1000, help="size of the synthetic category with --self-host")
+    args = parser.parse_args()
+
+    if not args.self_host:
+        run(args, args.port)
+        return
+
+    sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+    from synthetic import write_category
+
+    workdir = tempfile.mkdtemp(prefix="pylingo-load-test-")
+    shutil.copy(os.path.join(ROOT, "config.json"), workdir)
+    shutil.copytree(os.path.join(ROOT, "templates"), os.path.join(workdir, "templates"))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        args.category = f"synthetic{args.phrases}"
+        write_category(".", args.category, args.phrases)
+        self_hosted(args)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
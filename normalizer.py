@@ -0,0 +1,96 @@
+import hashlib
+import json
+import string
+import unicodedata
+from typing import List
+
+# "Combining Diacritical Marks" block, what is left of accents after NFKD
+COMBINING_MARKS = range(0x0300, 0x0370)
+# joins sentences normalised together, untouched by lower, translate and NFKD
+SEPARATOR = "\x1f"
+
+
+class Normalizer:
+    """
+    Normalises sentences so an answer can be compared with the truth,
+    compiled once from the config params into str.translate tables
+    """
+
+    def __init__(self, params: dict):
+        self.unicode_folding = params.get("unicode-folding", False)
+        # identifies the normalisation, normalised text stored on disk is only
+        # reused if it was produced by a normalizer with the same fingerprint
+        settings = {"accents-lookup": params["accents-lookup"], "unicode-folding": self.unicode_folding}
+        self.fingerprint = hashlib.md5(json.dumps(settings, sort_keys=True).encode("utf-8")).digest()
+
+        # characters removed by preprocess
+        self.preprocess_table = str.maketrans("", "", string.punctuation + "\n\t")
+
+        # str.translate only maps single characters, longer keys fall back to str.replace
+        accents_lookup = params["accents-lookup"]
+        self.accents_table = str.maketrans({k: v for k, v in accents_lookup.items() if len(k) == 1})
+        self.multi_char_accents = [(k, v) for k, v in accents_lookup.items() if len(k) != 1]
+        self.combining_table = dict.fromkeys(COMBINING_MARKS)
+
+        # preprocess and replace_accents in a single pass
+        self.normalize_table = dict(self.preprocess_table)
+        self.normalize_table.update(self.accents_table)
+
+        # the same as operations on utf-8 bytes, several times faster over long text, they
+        # give the same result unless a replacement involves a removed character or another key
+        removed = string.punctuation + "\n\t"
+        single_char_accents = [(k, v) for k, v in accents_lookup.items() if len(k) == 1]
+        self.removed_bytes = removed.encode("utf-8")
+        self.accents_bytes = [(k.encode("utf-8"), v.encode("utf-8")) for k, v in single_char_accents]
+        self.bytes_equivalent = not any(c in removed for k, v in single_char_accents for c in k + v) \
+            and not any(k in v for k, _ in single_char_accents for _, v in single_char_accents)
+
+    def preprocess(self, sentence: str) -> str:
+        """
+        strips whitespace, lowercases and removes punctuation
+        """
+        return sentence.strip().lower().translate(self.preprocess_table)
+
+    def replace_accents(self, sentence: str) -> str:
+        """
+        replace letters in sentence containing non-primary
+        language accents with primary language equivalents
+        """
+        sentence = sentence.translate(self.accents_table)
+        return self.fold(sentence)
+
+    def normalize(self, sentence: str) -> str:
+        """
+        preprocess then replace_accents
+        """
+        sentence = sentence.strip().lower().translate(self.normalize_table)
+        return self.fold(sentence)
+
+    def normalize_many(self, sentences: List[str]) -> List[str]:
+        """
+        normalize for many sentences, joined so each step runs once over all of them
+        """
+        joined = SEPARATOR.join([sentence.strip() for sentence in sentences]).lower()
+        if self.bytes_equivalent:
+            encoded = joined.encode("utf-8", "surrogatepass").translate(None, self.removed_bytes)
+            for k, v in self.accents_bytes:
+                encoded = encoded.replace(k, v)
+            joined = encoded.decode("utf-8", "surrogatepass")
+        else:
+            joined = joined.translate(self.normalize_table)
+        normalized = self.fold(joined).split(SEPARATOR)
+        if len(normalized) != len(sentences):
+            # a sentence contained the separator
+            return [self.normalize(sentence) for sentence in sentences]
+        return normalized
+
+    def fold(self, sentence: str) -> str:
+        """
+        applies multi character accent replacements and, if enabled,
+        strips any remaining accents using unicode NFKD decomposition
+        """
+        for k, v in self.multi_char_accents:
+            sentence = sentence.replace(k, v)
+        if self.unicode_folding and not sentence.isascii():
+            sentence = unicodedata.normalize("NFKD", sentence).translate(self.combining_table)
+        return sentence
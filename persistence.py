@@ -0,0 +1,181 @@
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_writer(path: str, mode: str = "wb", **kwargs):
+    """
+    Context manager giving a file object that writes to a temporary file next to
+    path, renamed over path only once the block finishes without an exception,
+    so a crash part way through never leaves a truncated file behind
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, **kwargs) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file readable by the owner only
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_bytes_atomic(path: str, data: bytes):
+    """
+    Atomically writes data to path, see atomic_writer
+    """
+    with atomic_writer(path) as f:
+        f.write(data)
+
+
+def write_json_atomic(path: str, data: dict, **kwargs):
+    """
+    Atomically writes data to path as json, see write_bytes_atomic
+    """
+    write_bytes_atomic(path, json.dumps(data, **kwargs).encode("utf-8"))
+
+
+class WeightsWriter:
+    """
+    Write-behind persistence of weights, saves are coalesced per file and
+    written on a background thread once max_delay seconds have passed or
+    max_pending saves have been requested, whichever comes first
+    """
+
+    def __init__(self, max_delay: float = 2.0, max_pending: int = 50, write_batch=None):
+        """
+        Parameters
+        ----------
+        max_delay: seconds a save may wait before it is written
+        max_pending: number of saves that triggers a write straight away
+        write_batch: optional function taking a dict of path -> weights and writing
+        them all, for storing weights somewhere other than json files
+        """
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.write_batch = write_batch or self.write_files
+        # path -> weights list, only the latest weights for a path are kept
+        self.pending = {}
+        self.pending_count = 0
+        self.first_pending_time = None
+        self.writes = 0
+        self.lock = threading.Lock()
+        self.wake = threading.Condition(self.lock)
+        self.idle = threading.Condition(self.lock)
+        self.writing = False
+        self.writing_paths = set()
+        self.closed = False
+        # started on the first save so unused writers cost no thread
+        self.thread = None
+
+    def schedule(self, path: str, weights: list):
+        """
+        Request weights be saved to path, returns immediately
+        Parameters
+        ----------
+        path: path of weights.json file
+        weights: list of weights, read when the write actually happens
+        """
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("cannot schedule save on closed WeightsWriter")
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="weights-writer", daemon=True)
+                self.thread.start()
+                atexit.register(self.close)
+            self.pending[path] = weights
+            self.pending_count += 1
+            if self.first_pending_time is None:
+                # wake the writer so it starts the max_delay countdown
+                self.first_pending_time = time.monotonic()
+                self.wake.notify()
+            elif self.pending_count >= self.max_pending:
+                self.wake.notify()
+
+    def flush(self, path: str = None):
+        """
+        Blocks until all scheduled saves, or only those of path if given, have been written to disk
+        """
+        def busy() -> bool:
+            if path is None:
+                return bool(self.pending) or self.writing
+            return path in self.pending or path in self.writing_paths
+
+        with self.lock:
+            if busy():
+                self.pending_count = self.max_pending
+                self.wake.notify()
+            while busy():
+                self.idle.wait()
+
+    def close(self):
+        """
+        Writes outstanding saves and stops the background thread
+        """
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.wake.notify()
+        if self.thread is not None:
+            self.thread.join()
+
+    def write_files(self, batch: dict):
+        """
+        Writes each path's weights to a json file
+        """
+        for path, weights in batch.items():
+            try:
+                write_json_atomic(path, {"weights": weights})
+                self.writes += 1
+            except OSError as e:
+                print(f"couldnt save weights to {path} {str(e)}")
+
+    def run(self):
+        """
+        Background loop writing pending saves
+        """
+        while True:
+            with self.lock:
+                while not self.closed:
+                    if self.pending_count >= self.max_pending:
+                        break
+                    if self.first_pending_time is None:
+                        self.wake.wait()
+                        continue
+                    remaining = self.first_pending_time + self.max_delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.wake.wait(remaining)
+                batch = self.pending
+                self.pending = {}
+                self.pending_count = 0
+                self.first_pending_time = None
+                self.writing = True
+                self.writing_paths = set(batch)
+                # snapshot the lists, the gui thread keeps mutating them
+                batch = {path: list(weights) for path, weights in batch.items()}
+                closed = self.closed
+
+            try:
+                self.write_batch(batch)
+            except Exception as e:
+                # the batch is dropped, the weights are still in memory and saved with the next change
+                print(f"couldnt save weights to {', '.join(batch)} {str(e)}")
+            finally:
+                with self.lock:
+                    self.writing = False
+                    self.writing_paths = set()
+                    self.idle.notify_all()
+            if closed:
+                return
@@ -0,0 +1,224 @@
+"""
+Append-only journal of changes to a category's phrases, assets/<category>/phrases.journal,
+so adding a phrase appends one line instead of rewriting phrases.json.
+Each line is a json entry with a sequence number:
+    {"seq": 7, "op": "add", "phrase": ["known", "new"]}
+    {"seq": 8, "op": "edit", "index": 3, "phrase": ["known", "new"]}
+    {"seq": 9, "op": "delete", "index": 5}
+Phrases are never removed or reordered, deleted phrases are kept as tombstones
+listed under "deleted" in phrases.json, so indices into weights.json and the
+audio files stay valid. Once the journal passes a number of entries it is
+compacted into phrases.json on a background thread, phrases.json records the
+sequence number it contains up to so entries are never applied twice.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Set, Tuple
+
+from persistence import atomic_writer
+
+JOURNAL_NAME = "phrases.journal"
+# entries in the journal that trigger a compaction
+COMPACT_ENTRIES = 1000
+
+
+def phrases_path(category: str) -> str:
+    return os.path.join("assets", category, "phrases.json")
+
+
+def journal_path(category: str) -> str:
+    return os.path.join("assets", category, JOURNAL_NAME)
+
+
+def write_phrases(path: str, syntax: Iterable[list], deleted: Set[int] = None, sequence: int = 0):
+    """
+    Atomically writes phrases.json with one phrase per line, syntax is written as it is iterated
+    Parameters
+    ----------
+    path: path of phrases.json
+    syntax: phrase pairs
+    deleted: indices of deleted phrases
+    sequence: sequence number of the last journal entry included in syntax and deleted
+    """
+    with atomic_writer(path, "w", encoding="utf-8") as f:
+        f.write('{"syntax":[')
+        separator = "\n  "
+        for pair in syntax:
+            f.write(separator + json.dumps(pair, ensure_ascii=False))
+            separator = ",\n  "
+        f.write("\n]")
+        if deleted:
+            f.write(f',\n"deleted": {json.dumps(sorted(deleted))}')
+        if sequence:
+            f.write(f',\n"journal-sequence": {sequence}')
+        f.write("}\n")
+
+
+class PhraseJournal:
+    """
+    Journal of one category, get it with phrase_journal so every user in the
+    process shares the same instance and lock
+    """
+
+    def __init__(self, category: str, compact_entries: int = COMPACT_ENTRIES):
+        self.category = category
+        self.compact_entries = compact_entries
+        self.lock = threading.RLock()
+        # only one compaction at a time, appends are not blocked while it writes
+        self.compaction_lock = threading.Lock()
+        self.compaction = None
+        # known after the first read
+        self.sequence = None
+        self.entries = 0
+        self.length = 0
+
+    def read(self) -> Tuple[List[list], Set[int]]:
+        """
+        returns the category's phrases and the indices of deleted phrases,
+        phrases.json with the journal replayed on top
+        """
+        with self.lock:
+            with open(phrases_path(self.category), "r", encoding="utf-8") as f:
+                base = json.load(f)
+            syntax = base["syntax"]
+            deleted = set(base.get("deleted", []))
+            sequence = base.get("journal-sequence", 0)
+            entries = 0
+            for entry in self.journal_entries():
+                if entry["seq"] <= sequence:
+                    continue
+                if entry["op"] == "add":
+                    syntax.append(entry["phrase"])
+                elif entry["op"] == "edit":
+                    syntax[entry["index"]] = entry["phrase"]
+                elif entry["op"] == "delete":
+                    deleted.add(entry["index"])
+                sequence = entry["seq"]
+                entries += 1
+            self.sequence = sequence
+            self.entries = entries
+            self.length = len(syntax)
+            return syntax, deleted
+
+    def journal_entries(self):
+        path = journal_path(self.category)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            offset = 0
+            for line in f:
+                # a crash part way through an append leaves a line without its newline
+                if not line.endswith(b"\n"):
+                    print(f"removing incomplete entry at the end of {path}")
+                    with open(path, "r+b") as journal:
+                        journal.truncate(offset)
+                    return
+                offset += len(line)
+                yield json.loads(line)
+
+    def append(self, entries: List[dict]):
+        """
+        appends entries to the journal, compacting it in the background if it has grown too long
+        """
+        if not entries:
+            return
+        with self.lock:
+            if self.sequence is None:
+                self.read()
+            lines = []
+            for entry in entries:
+                self.sequence += 1
+                lines.append(json.dumps({"seq": self.sequence, **entry}, ensure_ascii=False) + "\n")
+                if entry["op"] == "add":
+                    self.length += 1
+            with open(journal_path(self.category), "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries += len(entries)
+            compact = self.entries >= self.compact_entries
+        if compact:
+            self.compact_in_background()
+
+    def add(self, phrases: List[list]):
+        self.append([{"op": "add", "phrase": list(p)} for p in phrases])
+
+    def edit(self, index: int, phrase: list):
+        self.append([{"op": "edit", "index": index, "phrase": list(phrase)}])
+
+    def delete(self, index: int):
+        self.append([{"op": "delete", "index": index}])
+
+    def compact(self):
+        """
+        Writes the journal into phrases.json and removes the entries written from the journal
+        """
+        with self.compaction_lock:
+            syntax, deleted = self.read()
+            sequence = self.sequence
+            # entries appended while phrases.json is written have a higher sequence and are kept
+            write_phrases(phrases_path(self.category), syntax, deleted, sequence)
+            self.discard(sequence)
+
+    def discard(self, sequence: int):
+        """
+        removes entries up to sequence from the journal, once they have been written into phrases.json
+        """
+        with self.lock:
+            remaining = [e for e in self.journal_entries() if e["seq"] > sequence]
+            if remaining:
+                with atomic_writer(journal_path(self.category), "w", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in remaining))
+            elif os.path.exists(journal_path(self.category)):
+                os.remove(journal_path(self.category))
+            self.entries = len(remaining)
+
+    def invalidate(self):
+        """
+        forgets what is known about the files, for when they were changed by
+        another process, they are read again before the next append
+        """
+        with self.lock:
+            self.sequence = None
+
+    @contextmanager
+    def exclusive(self):
+        """
+        Context manager holding off appends and compaction, for rewriting phrases.json directly
+        """
+        with self.compaction_lock, self.lock:
+            yield
+            # what was written is unknown, read it again before the next append
+            self.sequence = None
+
+    def compact_in_background(self):
+        with self.lock:
+            if self.compaction is not None and self.compaction.is_alive():
+                return
+            self.compaction = threading.Thread(target=self.compact, name=f"compact-{self.category}", daemon=True)
+            self.compaction.start()
+
+
+# category -> journal
+JOURNALS: Dict[str, PhraseJournal] = {}
+JOURNALS_LOCK = threading.Lock()
+
+
+def phrase_journal(category: str) -> PhraseJournal:
+    with JOURNALS_LOCK:
+        journal = JOURNALS.get(category)
+        if journal is None:
+            journal = PhraseJournal(category)
+            JOURNALS[category] = journal
+        return journal
+
+
+def read_phrases(category: str) -> Tuple[List[list], Set[int]]:
+    """
+    returns phrases of category and indices of deleted phrases, see PhraseJournal.read
+    """
+    return phrase_journal(category).read()
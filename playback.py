@@ -0,0 +1,220 @@
+"""
+Plays phrase audio on one long lived thread that owns the output device, so
+playing a phrase doesn't open the device or decode the file again each time.
+With miniaudio, listed in requirements.txt, clips are decoded once into a memory
+bounded cache of recently played clips, decoded ahead of time when a phrase is
+asked, and a new clip interrupts the one playing. If it can't be imported clips
+are played with playsound on the same thread one at a time, a clip asked for
+while another plays replaces any clip still waiting.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+# format every clip is decoded to, so the device never has to be reopened
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2
+
+
+class ClipCache:
+    """
+    Least recently used decoded clips up to max_bytes of samples
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # path -> (mtime of the file when decoded, samples), least recently used first
+        self.clips = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str, mtime: int) -> Optional[bytes]:
+        clip = self.clips.get(path)
+        if clip is None or clip[0] != mtime:
+            self.misses += 1
+            return None
+        self.clips.move_to_end(path)
+        self.hits += 1
+        return clip[1]
+
+    def put(self, path: str, mtime: int, samples: bytes):
+        old = self.clips.pop(path, None)
+        if old is not None:
+            self.bytes -= len(old[1])
+        if len(samples) > self.max_bytes:
+            return
+        self.clips[path] = (mtime, samples)
+        self.bytes += len(samples)
+        while self.bytes > self.max_bytes:
+            _, (_, evicted) = self.clips.popitem(last=False)
+            self.bytes -= len(evicted)
+
+
+class PlaybackEngine:
+    """
+    Plays audio files on a background thread, call play from any thread
+    """
+
+    def __init__(self, cache_bytes: int = 64 * 1024 * 1024):
+        """
+        Parameters
+        ----------
+        cache_bytes: memory decoded clips may use
+        """
+        # imported on the playback thread so it doesn't slow down starting the app
+        self.miniaudio = None
+        self.cache = ClipCache(cache_bytes)
+        self.lock = threading.Condition()
+        # clip asked to play and when, replaced by each call to play
+        self.request = None
+        self.requested_at = None
+        # files to decode ahead of being played, most recent last
+        self.preloads = deque(maxlen=8)
+        # samples of the clip playing and the position in them, read by the device
+        self.samples = b""
+        self.position = 0
+        # when the clip handed to the device was asked for, until its first sample is read
+        self.started_at = None
+        # seconds from play being called to the first sample of the clip being handed to the device
+        self.latencies = deque(maxlen=100)
+        self.closed = False
+        self.device = None
+        self.thread = threading.Thread(target=self.run, name="playback", daemon=True)
+        self.thread.start()
+
+    def play(self, path: str):
+        """
+        plays the audio file at path, interrupting the clip playing if the device allows it
+        """
+        with self.lock:
+            self.request = path
+            self.requested_at = time.perf_counter()
+            self.lock.notify()
+
+    def preload(self, path: str):
+        """
+        decodes the audio file at path in the background so playing it starts straight away
+        """
+        with self.lock:
+            self.preloads.append(path)
+            self.lock.notify()
+
+    def stop(self):
+        """
+        stops the clip playing and any clip waiting to play
+        """
+        with self.lock:
+            self.request = None
+            self.samples = b""
+            self.position = 0
+
+    def shutdown(self):
+        with self.lock:
+            self.closed = True
+            self.lock.notify()
+        self.thread.join(timeout=1)
+        if self.device is not None:
+            self.device.close()
+
+    def time_to_first_sample(self) -> Optional[float]:
+        """
+        returns median seconds from play to the first sample of the clip, None before anything has played
+        """
+        if not self.latencies:
+            return None
+        return sorted(self.latencies)[len(self.latencies) // 2]
+
+    def report(self) -> str:
+        if self.miniaudio is None:
+            return "playsound, time to first sample n/a, install miniaudio to cache, preload and interrupt clips"
+        latency = self.time_to_first_sample()
+        latency = "n/a" if latency is None else f"{1000 * latency:.1f} ms"
+        return (f"miniaudio, time to first sample {latency}, cached clips {len(self.cache.clips)} "
+                f"({self.cache.bytes / 1024 / 1024:.1f} MB), {self.cache.hits} hits, {self.cache.misses} misses")
+
+    def run(self):
+        try:
+            import miniaudio
+            self.miniaudio = miniaudio
+        except ImportError:
+            pass
+        while True:
+            with self.lock:
+                while not self.closed and self.request is None and not self.preloads:
+                    self.lock.wait()
+                if self.closed:
+                    return
+                # a clip to play always goes before decoding ahead
+                if self.request is not None:
+                    path, requested_at, preload = self.request, self.requested_at, False
+                    self.request = None
+                else:
+                    path, requested_at, preload = self.preloads.pop(), None, True
+            try:
+                if self.miniaudio is None:
+                    # playsound can't decode ahead
+                    if not preload:
+                        self.play_with_playsound(path)
+                else:
+                    samples = self.decode(path)
+                    if not preload:
+                        self.start(samples, requested_at)
+            except Exception as e:
+                print(f"exception when playing audio from file {path} {str(e)}")
+
+    def play_with_playsound(self, path: str):
+        from playsound import playsound
+
+        # playsound blocks until the clip ends, it can't be interrupted, and doesn't
+        # say when the first sample was played so no latency is recorded
+        playsound(path)
+
+    def decode(self, path: str) -> bytes:
+        """
+        returns samples of the audio file at path in the device's format, from the cache if decoded before
+        """
+        mtime = os.stat(path).st_mtime_ns
+        samples = self.cache.get(path, mtime)
+        if samples is None:
+            decoded = self.miniaudio.decode_file(path, output_format=self.miniaudio.SampleFormat.SIGNED16,
+                                                 nchannels=CHANNELS, sample_rate=SAMPLE_RATE)
+            samples = decoded.samples.tobytes()
+            self.cache.put(path, mtime, samples)
+        return samples
+
+    def start(self, samples: bytes, requested_at: float):
+        """
+        hands samples to the device, replacing the clip playing
+        """
+        with self.lock:
+            self.samples = samples
+            self.position = 0
+            self.started_at = requested_at
+        if self.device is None:
+            self.device = self.miniaudio.PlaybackDevice(output_format=self.miniaudio.SampleFormat.SIGNED16,
+                                                        nchannels=CHANNELS, sample_rate=SAMPLE_RATE)
+            stream = self.stream()
+            next(stream)
+            self.device.start(stream)
+
+    def stream(self):
+        """
+        Generator the device pulls samples from, silence while nothing plays
+        """
+        frame_bytes = CHANNELS * SAMPLE_WIDTH
+        required_frames = yield b""
+        while True:
+            size = required_frames * frame_bytes
+            with self.lock:
+                chunk = self.samples[self.position:self.position + size]
+                if chunk and self.position == 0 and self.started_at is not None:
+                    self.latencies.append(time.perf_counter() - self.started_at)
+                    self.started_at = None
+                self.position += len(chunk)
+            if len(chunk) < size:
+                chunk += bytes(size - len(chunk))
+            required_frames = yield chunk
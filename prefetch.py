@@ -0,0 +1,80 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from tts import TTSBackend
+
+
+class AudioPrefetcher:
+    """
+    Synthesises audio for phrases on a pool of worker threads ahead of
+    the audio being played, so playback doesn't wait on the backend
+    """
+
+    def __init__(self, backend: TTSBackend, workers: int = 2):
+        self.backend = backend
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="audio-prefetch")
+        # path -> future of synthesis currently running or queued for path
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def prefetch(self, path: str, phrase: str, lang: str) -> Future:
+        """
+        Starts synthesising phrase to path unless the file already exists or
+        is already being synthesised, returns immediately
+        Parameters
+        ----------
+        path: filepath the audio should be written to
+        phrase: text to synthesise
+        lang: language code of phrase
+
+        Returns
+        -------
+        future that resolves to True once the audio file exists
+        """
+        with self.lock:
+            future = self.in_flight.get(path)
+            if future is not None:
+                return future
+            if os.path.exists(path):
+                future = Future()
+                future.set_result(True)
+                return future
+            future = self.executor.submit(self.synthesize, path, phrase, lang)
+            self.in_flight[path] = future
+            return future
+
+    def resolve(self, path: str, phrase: str, lang: str, timeout: float = None) -> bool:
+        """
+        Waits until audio for phrase exists at path, synthesising it if
+        it wasn't already prefetched, returns True if the file exists
+        """
+        return self.prefetch(path, phrase, lang).result(timeout)
+
+    def synthesize(self, path: str, phrase: str, lang: str) -> bool:
+        """
+        run on a worker thread, the audio is written to a temporary
+        file first so a half written file is never played
+        """
+        # hidden name so it can't be mistaken for the audio of a phrase
+        directory, filename = os.path.split(path)
+        tmp_path = os.path.join(directory, f".{filename}.part")
+        try:
+            ok = self.backend.synthesize(phrase, tmp_path, lang)
+            if ok:
+                os.replace(tmp_path, path)
+            return ok
+        except Exception as e:
+            print(f"exception when synthesising audio for '{phrase}' {str(e)}")
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            with self.lock:
+                self.in_flight.pop(path, None)
+
+    def shutdown(self):
+        """
+        stops the worker threads, queued synthesis is cancelled
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
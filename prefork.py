@@ -0,0 +1,233 @@
+"""
+Serves pyLingo from several processes so grading and sampling use every core,
+started with: python server.py --workers 8
+The master process compiles every category into a pack in shared memory once
+and forks the workers, which read phrases straight from that memory. The master
+accepts connections and hands each to the worker owning the learner in its
+cookie, so a learner's weights only ever live in one process.
+"""
+import os
+import re
+import selectors
+import signal
+import socket
+import time
+import traceback
+from multiprocessing import shared_memory
+
+from category_pack import CategoryPack, pack_bytes
+from config import Config
+from normalizer import Normalizer
+from server import MAX_HEADER_SIZE, PyLingoServer, worker_for
+
+LEARNER_COOKIE = re.compile(rb"(?im)^cookie:.*?\blearner=([0-9a-f]{32})\b")
+# seconds a connection may take to send its request headers
+HEADER_TIMEOUT = 10.0
+# seconds between peeks at a connection whose headers are incomplete
+PEEK_INTERVAL = 0.002
+
+
+class SharedPacks:
+    """
+    Packs of categories held in shared memory, created before forking so the
+    workers inherit the mappings and share the pages instead of copying them
+    """
+
+    def __init__(self, categories: list, normalizer: Normalizer):
+        self.memory = {}
+        self.packs = {}
+        for category in categories:
+            try:
+                data = pack_bytes(category, normalizer)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"category {category} could not be packed, workers will load it themselves: {str(e)}")
+                continue
+            memory = shared_memory.SharedMemory(create=True, size=len(data))
+            memory.buf[:len(data)] = data
+            self.memory[category] = memory
+            self.packs[category] = CategoryPack(buffer=memory.buf)
+
+    def close(self):
+        self.packs = {}
+        for memory in self.memory.values():
+            memory.close()
+            memory.unlink()
+        self.memory = {}
+
+
+class PreforkServer:
+    """
+    Master process of multi-process serving, routes connections to workers
+    each running a PyLingoServer
+    """
+
+    def __init__(self, config: Config, default_category: str, profiles_path: str, workers: int,
+                 max_sessions: int = 10000):
+        self.config = config
+        self.default_category = default_category
+        self.profiles_path = profiles_path
+        self.workers = workers
+        self.max_sessions = max_sessions
+        self.packs = None
+        self.listener = None
+        # worker index -> unix socket connections are sent to it over
+        self.channels = {}
+        # pid -> worker index
+        self.pids = {}
+        # connection -> time by which its headers must have arrived
+        self.pending = {}
+        self.next_worker = 0
+        self.running = False
+
+    def spawn(self, index: int):
+        channel, worker_channel = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        pid = os.fork()
+        if pid == 0:
+            # the worker only keeps its own end of its own channel
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            self.listener.close()
+            channel.close()
+            for other in self.channels.values():
+                other.close()
+            for connection in self.pending:
+                connection.close()
+            status = 1
+            try:
+                self.run_worker(index, worker_channel)
+                status = 0
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                # never return into the master's code
+                os._exit(status)
+        worker_channel.close()
+        self.channels[index] = channel
+        self.pids[pid] = index
+
+    def run_worker(self, index: int, channel: socket.socket):
+        import asyncio
+
+        # each worker opens its own connection to the profile database after forking
+        server = PyLingoServer(self.config, self.default_category, self.profiles_path,
+                               packs=self.packs.packs, max_sessions=self.max_sessions,
+                               worker=index, workers=self.workers)
+        try:
+            asyncio.run(server.serve_channel(channel))
+        finally:
+            server.close()
+
+    def dispatch(self, selector: selectors.BaseSelector, connection: socket.socket, head: bytes):
+        """
+        sends connection to the worker of the learner in head, new learners are spread round robin
+        """
+        selector.unregister(connection)
+        del self.pending[connection]
+        if not head:
+            connection.close()
+            return
+        match = LEARNER_COOKIE.search(head)
+        if match is not None:
+            index = worker_for(match.group(1).decode("ascii"), self.workers)
+        else:
+            index = self.next_worker
+            self.next_worker = (self.next_worker + 1) % self.workers
+        try:
+            socket.send_fds(self.channels[index], [b"c"], [connection.fileno()])
+        except OSError as e:
+            print(f"connection could not be sent to worker {index}: {str(e)}")
+        connection.close()
+
+    def peek(self, selector: selectors.BaseSelector, connection: socket.socket, retry: list):
+        try:
+            head = connection.recv(MAX_HEADER_SIZE, socket.MSG_PEEK)
+        except BlockingIOError:
+            return
+        except OSError:
+            head = b""
+        if head and b"\r\n\r\n" not in head and len(head) < MAX_HEADER_SIZE:
+            # the data stays readable while peeking, look again shortly instead of spinning
+            selector.unregister(connection)
+            retry.append((time.monotonic() + PEEK_INTERVAL, connection))
+            return
+        self.dispatch(selector, connection, head)
+
+    def reap(self):
+        """
+        replaces workers that have exited
+        """
+        while self.pids:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self.pids.pop(pid, None)
+            if index is None:
+                continue
+            self.channels.pop(index).close()
+            if self.running:
+                print(f"worker {index} exited with status {status}, restarting it")
+                self.spawn(index)
+
+    def run(self, host: str, port: int):
+        normalizer = Normalizer(self.config.params)
+        self.packs = SharedPacks(self.config.params["phrase-categories"], normalizer)
+        self.listener = socket.create_server((host, port), backlog=1024)
+        self.listener.setblocking(False)
+        self.running = True
+        for index in range(self.workers):
+            self.spawn(index)
+
+        def stop(signum, frame):
+            self.running = False
+        signal.signal(signal.SIGTERM, stop)
+
+        selector = selectors.DefaultSelector()
+        selector.register(self.listener, selectors.EVENT_READ)
+        retry = []
+        print(f"serving on http://{host}:{port} with {self.workers} workers")
+        try:
+            while self.running:
+                now = time.monotonic()
+                timeout = 0.5
+                if retry:
+                    timeout = max(0.0, min(t for t, _ in retry) - now)
+                for key, _ in selector.select(timeout):
+                    if key.fileobj is self.listener:
+                        try:
+                            connection, _ = self.listener.accept()
+                        except BlockingIOError:
+                            continue
+                        connection.setblocking(False)
+                        selector.register(connection, selectors.EVENT_READ)
+                        self.pending[connection] = time.monotonic() + HEADER_TIMEOUT
+                    else:
+                        self.peek(selector, key.fileobj, retry)
+
+                now = time.monotonic()
+                due = [c for t, c in retry if t <= now]
+                retry = [(t, c) for t, c in retry if t > now]
+                for connection in due:
+                    selector.register(connection, selectors.EVENT_READ)
+                expired = [c for c, deadline in self.pending.items() if deadline < now]
+                for connection in expired:
+                    if any(c is connection for _, c in retry):
+                        retry = [(t, c) for t, c in retry if c is not connection]
+                    else:
+                        selector.unregister(connection)
+                    del self.pending[connection]
+                    connection.close()
+                self.reap()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.running = False
+            # closing the channels lets the workers save weights and exit
+            for channel in self.channels.values():
+                channel.close()
+            for pid in list(self.pids):
+                os.waitpid(pid, 0)
+            self.listener.close()
+            self.packs.close()
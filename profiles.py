@@ -0,0 +1,191 @@
+"""
+Learner profiles, the weights of every learner for every category they have
+practised, stored in one SQLite database as float64 blobs. Only the profiles a
+learner actually opens are read and the most recently used are kept in memory.
+Migrate the json files written by earlier versions of server.py with:
+    python profiles.py learners/ learners.db
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+from persistence import WeightsWriter
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    learner TEXT NOT NULL,
+    category TEXT NOT NULL,
+    weights BLOB NOT NULL,
+    PRIMARY KEY (learner, category)
+) WITHOUT ROWID
+"""
+
+
+# PRAGMA user_version of databases whose weights are float64, 0 was float32
+WEIGHTS_VERSION = 1
+
+
+def weights_to_blob(weights: list) -> bytes:
+    blob = array("d", weights)
+    if sys.byteorder != "little":
+        blob.byteswap()
+    return blob.tobytes()
+
+
+def blob_to_weights(blob: bytes, typecode: str = "d") -> List[float]:
+    weights = array(typecode)
+    weights.frombytes(blob)
+    if sys.byteorder != "little":
+        weights.byteswap()
+    return weights.tolist()
+
+
+class ProfileStore:
+    """
+    Weights keyed by learner and category, saves are written behind by a
+    WeightsWriter in one transaction per batch
+    """
+
+    def __init__(self, path: str = "learners.db", cache_size: int = 1000,
+                 max_delay: float = 2.0, max_pending: int = 500):
+        """
+        Parameters
+        ----------
+        path: path of the database, created if it doesn't exist
+        cache_size: number of profiles kept in memory
+        max_delay: seconds a save may wait before it is written
+        max_pending: number of saves that triggers a write straight away
+        """
+        self.path = path
+        self.cache_size = cache_size
+        # (learner, category) -> weights, most recently used last
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.cache_lock = threading.Lock()
+        self.lock = threading.Lock()
+        # shared by the caller's thread and the writer thread, guarded by self.lock
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # several server processes may write to the same database
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(SCHEMA)
+        self.connection.commit()
+        self.upgrade()
+        self.writer = WeightsWriter(max_delay, max_pending, write_batch=self.write_batch)
+
+    def upgrade(self):
+        """
+        rewrites the float32 weights of databases written by earlier versions as float64
+        """
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] >= WEIGHTS_VERSION:
+            return
+        # another server process may be upgrading the same database
+        self.connection.execute("BEGIN IMMEDIATE")
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] < WEIGHTS_VERSION:
+            rows = self.connection.execute("SELECT learner, category, weights FROM profiles").fetchall()
+            self.connection.executemany("UPDATE profiles SET weights = ? WHERE learner = ? AND category = ?",
+                                        [(weights_to_blob(blob_to_weights(blob, "f")), learner, category)
+                                         for learner, category, blob in rows])
+            self.connection.execute(f"PRAGMA user_version = {WEIGHTS_VERSION}")
+        self.connection.commit()
+
+    def load(self, learner: str, category: str) -> Optional[List[float]]:
+        """
+        returns the learner's weights for category, None if they have never been saved
+        """
+        key = (learner, category)
+        with self.cache_lock:
+            weights = self.cache.get(key)
+            if weights is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return weights
+            self.misses += 1
+        # a save that is still queued is newer than the database
+        self.writer.flush(key)
+        with self.lock:
+            row = self.connection.execute("SELECT weights FROM profiles WHERE learner = ? AND category = ?",
+                                          key).fetchone()
+        if row is None:
+            return None
+        weights = blob_to_weights(row[0])
+        self.remember(key, weights)
+        return weights
+
+    def save(self, learner: str, category: str, weights: list):
+        """
+        queues weights to be saved, weights is read when the write happens
+        """
+        key = (learner, category)
+        self.remember(key, weights)
+        self.writer.schedule(key, weights)
+
+    def remember(self, key: tuple, weights: list):
+        with self.cache_lock:
+            self.cache[key] = weights
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                # evicted profiles are still queued with the writer if they were changed
+                self.cache.popitem(last=False)
+
+    def categories(self, learner: str) -> List[str]:
+        """
+        returns categories learner has saved weights for
+        """
+        self.writer.flush()
+        with self.lock:
+            rows = self.connection.execute("SELECT category FROM profiles WHERE learner = ?", (learner,)).fetchall()
+        return [row[0] for row in rows]
+
+    def write_batch(self, batch: dict):
+        """
+        writes batch of (learner, category) -> weights in one transaction, called by self.writer
+        """
+        rows = [(learner, category, weights_to_blob(weights)) for (learner, category), weights in batch.items()]
+        try:
+            with self.lock, self.connection:
+                self.connection.executemany("INSERT OR REPLACE INTO profiles (learner, category, weights) "
+                                            "VALUES (?, ?, ?)", rows)
+            self.writer.writes += len(rows)
+        except sqlite3.Error as e:
+            print(f"couldnt save {len(rows)} profiles to {self.path} {str(e)}")
+
+    def close(self):
+        self.writer.close()
+        with self.lock:
+            self.connection.close()
+
+
+def import_json(learners_dir: str, store: ProfileStore) -> int:
+    """
+    saves weights in learners_dir/<learner>/<category>.json to store, returns number imported
+    """
+    count = 0
+    for learner in os.listdir(learners_dir):
+        folder = os.path.join(learners_dir, learner)
+        if not os.path.isdir(folder):
+            continue
+        for filename in os.listdir(folder):
+            if not filename.endswith(".json"):
+                continue
+            with open(os.path.join(folder, filename), "r") as f:
+                weights = json.load(f)["weights"]
+            store.save(learner, filename[:-len(".json")], weights)
+            count += 1
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python profiles.py <learners folder> <database>")
+        sys.exit(1)
+    store = ProfileStore(sys.argv[2])
+    imported = import_json(sys.argv[1], store)
+    store.close()
+    print(f"imported {imported} profiles into {sys.argv[2]}")
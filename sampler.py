@@ -0,0 +1,72 @@
+from random import random
+from typing import List
+
+
+class WeightedSampler:
+    """
+    Fenwick tree over the phrase weights, picks an index with probability
+    proportional to its weight in O(log n) and supports O(log n) weight updates
+    """
+
+    def __init__(self, weights: List[float]):
+        self.size = len(weights)
+        self.weights = [float(w) for w in weights]
+        self.tree = [0.0] + self.weights
+        # build tree in O(n) by pushing each node into its parent
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+        self.mask = 1 << max(self.size.bit_length() - 1, 0)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def total(self) -> float:
+        """
+        returns sum of all weights
+        """
+        total = 0.0
+        i = self.size
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def update(self, index: int, weight: float):
+        """
+        set weight at index to weight
+        Parameters
+        ----------
+        index: index of phrase
+        weight: new weight of phrase
+        """
+        delta = weight - self.weights[index]
+        self.weights[index] = float(weight)
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def sample(self) -> int:
+        """
+        returns index chosen with probability proportional to its weight
+        """
+        if self.size == 0:
+            raise IndexError("cannot sample from empty weights")
+        total = self.total()
+        if total <= 0:
+            raise ValueError("total of weights must be greater than zero")
+        target = random() * total
+        position = 0
+        step = self.mask
+        while step:
+            next_position = position + step
+            if next_position <= self.size and self.tree[next_position] <= target:
+                position = next_position
+                target -= self.tree[next_position]
+            step >>= 1
+        # rounding in the tree can push the target past the last non-zero weight
+        while position >= self.size or self.weights[position] <= 0:
+            position = (position - 1) % self.size
+        return position
@@ -0,0 +1,410 @@
+"""
+Serves templates/index.html to many learners at once from a single asyncio process,
+run from the repository root with: python server.py --port 8080
+Each learner is identified by a cookie and has their own weights, phrases are loaded
+once per category and shared read only by every learner.
+"""
+import argparse
+import asyncio
+import html
+import mimetypes
+import os
+import re
+import socket
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict
+from urllib.parse import parse_qs, urlsplit
+
+from config import Config
+from headless import HeadlessGame
+from profiles import ProfileStore
+from prefetch import AudioPrefetcher
+from tts import configured_backend
+
+CHUNK_SIZE = 64 * 1024
+MAX_HEADER_SIZE = 16 * 1024
+MAX_BODY_SIZE = 64 * 1024
+LEARNER_ID = re.compile(r"^[0-9a-f]{32}$")
+STATUS = {200: "OK", 303: "See Other", 400: "Bad Request", 404: "Not Found",
+          405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+class Response:
+    """
+    HTTP response, body is bytes or the path of a file to stream
+    """
+
+    def __init__(self, status: int = 200, body: bytes = b"", content_type: str = "text/html; charset=utf-8",
+                 headers: dict = None, file_path: str = None):
+        self.status = status
+        self.body = body
+        self.headers = {"Content-Type": content_type}
+        self.headers.update(headers or {})
+        self.file_path = file_path
+
+
+def redirect(location: str) -> Response:
+    return Response(303, headers={"Location": location})
+
+
+def worker_for(learner: str, workers: int) -> int:
+    """
+    returns index of the worker process serving learner, the same in every process
+    """
+    return int(learner, 16) % workers
+
+
+class CategoryStore:
+    """
+    Phrases of each category, loaded on first use and shared read only by all learners
+    """
+
+    def __init__(self, config: Config, audio_prefetcher: AudioPrefetcher, packs: dict = None):
+        """
+        Parameters
+        ----------
+        config: configuration
+        audio_prefetcher: prefetcher shared by all learners
+        packs: optional category -> CategoryPack, read instead of the category's files
+        """
+        self.config = config
+        self.audio_prefetcher = audio_prefetcher
+        self.packs = packs or {}
+        self.categories = {}
+        self.lock = threading.Lock()
+
+    def get(self, category: str) -> HeadlessGame:
+        """
+        returns a game holding the loaded category, for HeadlessGame(shared=...)
+        """
+        # called from executor threads, only the first learner of a category loads it
+        with self.lock:
+            loaded = self.categories.get(category)
+            if loaded is None:
+                loaded = HeadlessGame(category, self.config,
+                                      pack=self.packs.get(category),
+                                      audio_prefetcher=self.audio_prefetcher)
+                self.categories[category] = loaded
+            return loaded
+
+
+class PyLingoServer:
+    """
+    asyncio HTTP server running one HeadlessGame per learner
+    """
+
+    def __init__(self,
+                 config: Config,
+                 default_category: str,
+                 profiles_path: str = "learners.db",
+                 packs: dict = None,
+                 max_sessions: int = 10000,
+                 worker: int = 0,
+                 workers: int = 1):
+        """
+        Parameters
+        ----------
+        config: configuration
+        default_category: category new learners start with
+        profiles_path: database learners' weights are saved in, see profiles.py
+        packs: optional category -> CategoryPack, e.g. packs in shared memory
+        max_sessions: number of learners' games kept in memory, the least recently
+        used are dropped and loaded again from their profile when they come back
+        worker: index of this process when serving with several, see prefork.py
+        workers: number of processes serving, new learners are given ids that
+        worker_for maps to this process
+        """
+        self.config = config
+        self.default_category = default_category
+        persistence = config.params.get("persistence", {})
+        self.profiles = ProfileStore(profiles_path, max_sessions, persistence.get("max-delay", 2.0))
+        tts = config.params.get("tts", {})
+        self.audio_prefetcher = AudioPrefetcher(configured_backend(config), tts.get("prefetch-workers", 2))
+        self.categories = CategoryStore(config, self.audio_prefetcher, packs)
+        self.worker = worker
+        self.workers = workers
+        self.max_sessions = max_sessions
+        # learner id -> game of the learner, most recently used last
+        self.sessions = OrderedDict()
+        # learner id -> future finished once the game being created for the learner is in sessions
+        self.loading: Dict[str, asyncio.Future] = {}
+        with open(os.path.join("templates", "index.html"), "r") as f:
+            self.template = f.read()
+        self.requests = 0
+
+    def new_learner_id(self) -> str:
+        while True:
+            learner = uuid.uuid4().hex
+            if worker_for(learner, self.workers) == self.worker:
+                return learner
+
+    async def session(self, learner: str, category: str = None) -> HeadlessGame:
+        """
+        returns game of learner, switched to category if given, creating it if needed
+        """
+        # another request of the learner is creating their game, wait for it rather than create a second
+        while learner in self.loading:
+            await asyncio.wait([self.loading[learner]])
+        game = self.sessions.get(learner)
+        if game is not None and (category is None or category == game.phrases_category):
+            self.sessions.move_to_end(learner)
+            return game
+        loop = asyncio.get_running_loop()
+        loaded = self.loading[learner] = loop.create_future()
+        try:
+            return await self.create_session(learner, category or self.default_category)
+        finally:
+            del self.loading[learner]
+            loaded.set_result(None)
+
+    async def create_session(self, learner: str, category: str) -> HeadlessGame:
+        loop = asyncio.get_running_loop()
+        # loading phrases and weights reads files, keep it off the event loop
+        shared = await loop.run_in_executor(None, self.categories.get, category)
+        game = await loop.run_in_executor(None, lambda: HeadlessGame(category,
+                                                                     self.config,
+                                                                     shared=shared,
+                                                                     persist=True,
+                                                                     profiles=self.profiles,
+                                                                     learner=learner,
+                                                                     weights_writer=self.profiles.writer,
+                                                                     audio_prefetcher=self.audio_prefetcher))
+        self.sessions[learner] = game
+        self.sessions.move_to_end(learner)
+        while len(self.sessions) > self.max_sessions:
+            # the dropped game's weights are already saved or queued in the profile store
+            self.sessions.popitem(last=False)
+        return game
+
+    def render(self, game: HeadlessGame) -> Response:
+        feedback = game.messages[-1] if game.messages else ""
+        values = {"category": html.escape(game.phrases_category),
+                  "phrase": html.escape(game.phrase),
+                  "feedback": html.escape(feedback),
+                  "form.user_input.label": '<label for="user_input">answer</label>',
+                  "form.user_input": '<input id="user_input" name="user_input" autofocus>'}
+
+        def replace(match) -> str:
+            expression = match.group(1).strip()
+            url = re.match(r"url_for\('(\w+)'\)", expression)
+            if url is not None:
+                return f"/{url.group(1)}"
+            return values.get(expression, "")
+
+        body = re.sub(r"\{\{(.+?)\}\}", replace, self.template)
+        return Response(body=body.encode("utf-8"))
+
+    async def handle(self, method: str, target: str, headers: dict, body: bytes) -> Response:
+        """
+        runs the request against the learner's game and returns the response
+        """
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        cookies = dict(c.strip().split("=", 1) for c in headers.get("cookie", "").split(";") if "=" in c)
+        learner = cookies.get("learner", "")
+        new_learner = LEARNER_ID.match(learner) is None
+        if new_learner:
+            learner = self.new_learner_id()
+
+        category = query.get("category", [None])[0]
+        if category is not None and category not in self.config.params["phrase-categories"]:
+            return Response(404, b"unknown category")
+        game = await self.session(learner, category)
+
+        route = url.path.strip("/") or "index"
+        if route == "index":
+            response = self.render(game)
+        elif route in ["submit", "login"]:
+            if method != "POST":
+                response = Response(405, b"submit answers with POST")
+            else:
+                form = parse_qs(body.decode("utf-8", "replace"))
+                game.submit(form.get("user_input", [""])[0])
+                response = redirect("/")
+        elif route == "peek":
+            game.on_peek()
+            response = redirect("/")
+        elif route == "skip":
+            game.on_skip()
+            response = redirect("/")
+        elif route == "reset":
+            game.on_reset()
+            response = redirect("/")
+        elif route == "audio":
+            response = await self.audio(game)
+        else:
+            response = Response(404, b"not found")
+
+        if new_learner:
+            response.headers["Set-Cookie"] = f"learner={learner}; Path=/; HttpOnly; SameSite=Lax"
+        return response
+
+    async def audio(self, game: HeadlessGame) -> Response:
+        """
+        returns response streaming audio of the current phrase, synthesising it if needed
+        """
+        if game.audio_index is None:
+            return Response(404, b"no audio for this category")
+        loop = asyncio.get_running_loop()
+        index = game.selected_index
+        # finding audio stats and touches files, keep it off the event loop
+        path = await loop.run_in_executor(None, game.find_audio, index)
+        if path is None:
+            ok = await asyncio.wrap_future(game.synthesize_audio(index, game.language2))
+            if not ok:
+                return Response(404, b"audio could not be synthesised")
+            path = await loop.run_in_executor(None, game.find_audio, index)
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        return Response(content_type=content_type, file_path=path)
+
+    async def send(self, writer: asyncio.StreamWriter, response: Response, keep_alive: bool):
+        loop = asyncio.get_running_loop()
+        f = None
+        if response.file_path is not None:
+            f = await loop.run_in_executor(None, open, response.file_path, "rb")
+            length = os.fstat(f.fileno()).st_size
+        else:
+            length = len(response.body)
+        lines = [f"HTTP/1.1 {response.status} {STATUS[response.status]}",
+                 f"Content-Length: {length}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines += [f"{k}: {v}" for k, v in response.headers.items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        if f is None:
+            writer.write(response.body)
+            await writer.drain()
+            return
+        try:
+            # file reads happen on the executor so a slow disk never blocks other learners
+            while True:
+                chunk = await loop.run_in_executor(None, f.read, CHUNK_SIZE)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+        finally:
+            f.close()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send(writer, Response(413, b"headers too large"), False)
+                    break
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        k, v = line.split(":", 1)
+                        headers[k.strip().lower()] = v.strip()
+                try:
+                    method, target, version = request_line.split(" ")
+                    length = int(headers.get("content-length", "0") or 0)
+                    if length < 0:
+                        raise ValueError("negative content length")
+                except ValueError:
+                    await self.send(writer, Response(400, b"bad request"), False)
+                    break
+                if length > MAX_BODY_SIZE:
+                    await self.send(writer, Response(413, b"body too large"), False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                self.requests += 1
+                response = await self.handle(method, target, headers, body)
+                await self.send(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int, sock=None):
+        """
+        serves until cancelled, on sock if given otherwise on host:port
+        """
+        if sock is not None:
+            server = await asyncio.start_server(self.handle_connection, sock=sock, limit=MAX_HEADER_SIZE)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_SIZE)
+        async with server:
+            await server.serve_forever()
+
+    async def serve_channel(self, channel: socket.socket):
+        """
+        serves connections whose file descriptors are sent over the unix socket
+        channel, until the channel is closed
+        """
+        loop = asyncio.get_running_loop()
+        received = asyncio.Queue()
+
+        def on_readable():
+            try:
+                data, fds, _, _ = socket.recv_fds(channel, 1, 1)
+            except BlockingIOError:
+                return
+            if not data:
+                # the master closed the channel
+                loop.remove_reader(channel.fileno())
+                received.put_nowait(None)
+                return
+            if not fds:
+                print(f"worker {self.worker} received a message without a connection, skipping it")
+                return
+            received.put_nowait(fds[0])
+
+        channel.setblocking(False)
+        loop.add_reader(channel.fileno(), on_readable)
+        connections = set()
+        while True:
+            fd = await received.get()
+            if fd is None:
+                break
+            reader, writer = await asyncio.open_connection(sock=socket.socket(fileno=fd), limit=MAX_HEADER_SIZE)
+            task = asyncio.ensure_future(self.handle_connection(reader, writer))
+            connections.add(task)
+            task.add_done_callback(connections.discard)
+        for task in list(connections):
+            task.cancel()
+
+    def close(self):
+        self.profiles.close()
+        self.audio_prefetcher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="serve pyLingo over http")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--category", default="conversational", help="category new learners start with")
+    parser.add_argument("--profiles", default="learners.db", help="database learners' weights are saved in")
+    parser.add_argument("--max-sessions", type=int, default=10000, help="learners kept in memory per process")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes to serve from, more than 1 uses every core, see prefork.py")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        from prefork import PreforkServer
+        PreforkServer(Config("config.json"), args.category, args.profiles, args.workers, args.max_sessions).run(args.host, args.port)
+        return
+
+    server = PyLingoServer(Config("config.json"), args.category, args.profiles, max_sessions=args.max_sessions)
+    print(f"serving on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Load test of the answer loop, drives many simulated learners through
+HeadlessGame and reports throughput, latency and weight convergence,
+run from the repository root with e.g.:
+    python simulate.py --learners 2000 --answers 50 --phrases 10000 --accuracy learning:0.3:0.5
+"""
+import argparse
+import math
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from config import Config
+from headless import HeadlessGame
+from persistence import WeightsWriter
+from prefetch import AudioPrefetcher
+from tts import FakeBackend
+
+
+class AccuracyModel:
+    """
+    Probability a learner answers a phrase correctly
+    """
+
+    def probability(self, times_seen: int) -> float:
+        raise NotImplementedError
+
+
+class ConstantAccuracy(AccuracyModel):
+    """
+    learner answers correctly with the same probability every time
+    """
+
+    def __init__(self, p: float):
+        self.p = p
+
+    def probability(self, times_seen: int) -> float:
+        return self.p
+
+
+class LearningAccuracy(AccuracyModel):
+    """
+    learner starts answering correctly with probability p0 and
+    improves towards always correct each time they see a phrase
+    """
+
+    def __init__(self, p0: float, rate: float):
+        self.p0 = p0
+        self.rate = rate
+
+    def probability(self, times_seen: int) -> float:
+        return 1 - (1 - self.p0) * math.exp(-self.rate * times_seen)
+
+
+def parse_accuracy(spec: str) -> AccuracyModel:
+    """
+    parses constant:<p> or learning:<p0>:<rate>
+    """
+    name, *values = spec.split(":")
+    values = [float(v) for v in values]
+    if name == "constant":
+        return ConstantAccuracy(*values)
+    if name == "learning":
+        return LearningAccuracy(*values)
+    raise ValueError(f"unknown accuracy model {spec}")
+
+
+def synthetic_syntax(size: int) -> list:
+    return [[f"phrase number {i}", f"fras nummer {i} på svenska"] for i in range(size)]
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def weight_summary(learners: List[HeadlessGame]) -> (float, float):
+    """
+    returns mean weight and fraction of weights at the minimum of 1 across all learners
+    """
+    total = 0
+    count = 0
+    at_floor = 0
+    for learner in learners:
+        total += sum(learner.weights)
+        count += len(learner.weights)
+        at_floor += sum(1 for w in learner.weights if w <= 1)
+    return total / count, at_floor / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="simulate learners to load test the answer loop")
+    parser.add_argument("--learners", type=int, default=1000)
+    parser.add_argument("--answers", type=int, default=50, help="answers submitted per learner")
+    parser.add_argument("--phrases", type=int, default=1000, help="size of synthetic category")
+    parser.add_argument("--category", default=None, help="use a real category instead of synthetic phrases")
+    parser.add_argument("--accuracy", default="learning:0.3:0.5",
+                        help="constant:<p> or learning:<p0>:<rate>")
+    parser.add_argument("--persist", action="store_true",
+                        help="save weights of every learner through a shared WeightsWriter")
+    parser.add_argument("--report-every", type=int, default=10, help="answers between convergence reports")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    config = Config("config.json")
+    accuracy = parse_accuracy(args.accuracy)
+    if args.category is not None:
+        syntax = HeadlessGame(args.category, config).syntax
+    else:
+        syntax = synthetic_syntax(args.phrases)
+
+    # shared between all learners, like a server would
+    normalized_truths = {}
+    prefetcher = AudioPrefetcher(FakeBackend())
+    writer = WeightsWriter(**({"max_delay": 1.0, "max_pending": 1000} if args.persist else {}))
+    weights_dir = tempfile.mkdtemp(prefix="pylingo-simulation-") if args.persist else None
+
+    start = time.perf_counter()
+    learners = [HeadlessGame(args.category or "simulated",
+                             config,
+                             syntax=syntax,
+                             normalized_truths=normalized_truths,
+                             persist=args.persist,
+                             weights_path=os.path.join(weights_dir, f"{i}.json") if args.persist else None,
+                             weights_writer=writer,
+                             audio_prefetcher=prefetcher)
+                for i in range(args.learners)]
+    print(f"created {args.learners} learners over {len(syntax)} phrases in {time.perf_counter() - start:.2f}s")
+    times_seen = [{} for _ in learners]
+
+    latencies = []
+    correct = 0
+    start = time.perf_counter()
+    for answer_number in range(1, args.answers + 1):
+        for learner, seen in zip(learners, times_seen):
+            index = learner.selected_index
+            if random.random() < accuracy.probability(seen.get(index, 0)):
+                answer = learner.language2
+            else:
+                answer = "fel svar"
+            seen[index] = seen.get(index, 0) + 1
+            t = time.perf_counter()
+            correct += learner.submit(answer)
+            latencies.append(time.perf_counter() - t)
+        if answer_number % args.report_every == 0 or answer_number == args.answers:
+            mean_weight, at_floor = weight_summary(learners)
+            print(f"answer {answer_number}: mean weight {mean_weight:.3f}, "
+                  f"{100 * at_floor:.1f}% of weights at minimum")
+    elapsed = time.perf_counter() - start
+    if args.persist:
+        writer.flush()
+    total_elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    submissions = len(latencies)
+    print(f"{submissions} submissions in {elapsed:.2f}s, {submissions / elapsed:,.0f} submissions/s, "
+          f"{100 * correct / submissions:.1f}% correct")
+    print(f"latency p50 {1e6 * percentile(latencies, 0.5):.1f}us "
+          f"p95 {1e6 * percentile(latencies, 0.95):.1f}us "
+          f"p99 {1e6 * percentile(latencies, 0.99):.1f}us "
+          f"max {1e6 * latencies[-1]:.1f}us")
+    if args.persist:
+        print(f"{writer.writes} weight files written to {weights_dir}, "
+              f"{total_elapsed - elapsed:.2f}s to flush after the last answer")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Synthesises audio for every phrase that has none, in all categories or the ones given,
+run from the repository root with e.g.:
+    python synthesize_audio.py --backend gtts --workers 4 --rate 5
+Audio is written to the audio store shared by all categories, see audio_store.py, so a
+phrase found in several categories is only synthesised once. Progress is recorded in a checkpoint file so an interrupted run can be resumed.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+
+from audio_index import AudioIndex
+from audio_store import AudioStore, audio_key, audio_store, category_audio
+from config import Config
+from persistence import write_json_atomic
+from phrase_journal import read_phrases
+from prefetch import AudioPrefetcher
+from tts import BACKENDS, RateLimitedBackend, TTSBackend, category_language, configured_backend
+
+
+def load_checkpoint(path: str) -> dict:
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def find_missing_audio(category: str,
+                       checkpoint: dict,
+                       retry_failed: bool,
+                       store: AudioStore,
+                       backend: TTSBackend,
+                       lang: str) -> list:
+    """
+    returns list of (index, new language phrase, key in store) for phrases of category without audio
+    """
+    syntax, deleted = read_phrases(category)
+    audio_index = AudioIndex(os.path.join("assets", category, "audio"))
+    audio = category_audio(category)
+    failed = set() if retry_failed else set(checkpoint.get(category, {}).get("failed", []))
+    missing = []
+    for i, s in enumerate(syntax):
+        if i in failed or i in deleted or audio_index.get(i) is not None:
+            continue
+        key = audio_key(s[1], lang, backend.voice, backend.name)
+        # not store.find, checking doesn't count as the audio being played
+        if os.path.exists(store.path(key, backend.extension)):
+            audio.record(i, key)
+        else:
+            missing.append((i, s[1], key))
+    return missing
+
+
+class Progress:
+    """
+    Counts finished jobs across worker threads and prints throughput
+    """
+
+    def __init__(self, total: int, checkpoint: dict, checkpoint_path: str, report_interval: float = 1.0):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.checkpoint = checkpoint
+        self.checkpoint_path = checkpoint_path
+        self.report_interval = report_interval
+        self.start = time.monotonic()
+        self.last_report = self.start
+        self.lock = threading.Lock()
+
+    def record(self, category: str, index: int, ok: bool):
+        with self.lock:
+            entry = self.checkpoint.setdefault(category, {"done": [], "failed": []})
+            if ok:
+                self.done += 1
+                entry["done"].append(index)
+            else:
+                self.failed += 1
+                entry["failed"].append(index)
+            now = time.monotonic()
+            if now - self.last_report >= self.report_interval:
+                self.last_report = now
+                self.save()
+                self.report()
+
+    def save(self):
+        write_json_atomic(self.checkpoint_path, self.checkpoint)
+
+    def report(self):
+        elapsed = time.monotonic() - self.start
+        finished = self.done + self.failed
+        rate = finished / elapsed if elapsed > 0 else 0
+        eta = (self.total - finished) / rate if rate > 0 else float("inf")
+        print(f"{finished}/{self.total} phrases, {self.failed} failed, "
+              f"{rate:.1f} phrases/s, eta {eta:.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="synthesise missing audio for phrases")
+    parser.add_argument("categories", nargs="*", help="categories to synthesise, all if none given")
+    parser.add_argument("--backend", default=None, choices=list(BACKENDS),
+                        help="text to speech backend, defaults to the one in config.json")
+    parser.add_argument("--workers", type=int, default=4, help="number of concurrent syntheses")
+    parser.add_argument("--rate", type=float, default=5.0, help="maximum syntheses per second")
+    parser.add_argument("--checkpoint", default="synthesis_checkpoint.json", help="checkpoint file")
+    parser.add_argument("--retry-failed", action="store_true", help="retry phrases that failed in a previous run")
+    args = parser.parse_args()
+
+    config = Config("config.json")
+    backend = RateLimitedBackend(configured_backend(config, args.backend), args.rate)
+    prefetcher = AudioPrefetcher(backend, args.workers)
+    store = audio_store(config)
+    checkpoint = load_checkpoint(args.checkpoint)
+
+    jobs = []
+    for category in args.categories or config.params["phrase-categories"]:
+        lang = category_language(config, category)
+        for index, phrase, key in find_missing_audio(category, checkpoint, args.retry_failed, store, backend, lang):
+            jobs.append((category, index, phrase, key, lang))
+    keys = len({job[3] for job in jobs})
+    print(f"{len(jobs)} phrases without audio, {keys} different audio files, synthesising with {backend.name}")
+    if not jobs:
+        return
+
+    progress = Progress(len(jobs), checkpoint, args.checkpoint)
+    # bound the number of queued jobs so memory doesn't grow with the number of phrases
+    slots = threading.BoundedSemaphore(2 * args.workers)
+
+    def on_done(future, category, index, key, path):
+        if not future.cancelled():
+            ok = future.result()
+            if ok:
+                store.record(path)
+                category_audio(category).record(index, key)
+            progress.record(category, index, ok)
+        slots.release()
+
+    try:
+        for category, index, phrase, key, lang in jobs:
+            slots.acquire()
+            path = store.path(key, backend.extension, create=True)
+            # a phrase already synthesised for another category resolves straight away
+            future = prefetcher.prefetch(path, phrase, lang)
+            future.add_done_callback(lambda f, c=category, i=index, k=key, p=path: on_done(f, c, i, k, p))
+        prefetcher.executor.shutdown(wait=True)
+    except KeyboardInterrupt:
+        print("interrupted, progress saved, run again to resume")
+        prefetcher.shutdown()
+    progress.save()
+    progress.report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+from add_content.importer import valid_category_name
+
+
+def test_valid_category_names():
+    assert valid_category_name("spanish")
+    assert valid_category_name("cafe phrases")
+
+
+def test_category_names_outside_assets_rejected():
+    for name in ["", " ", ".", "..", "../spanish", "spanish/cafe", "/tmp/spanish", "spanish\0"]:
+        assert not valid_category_name(name), name
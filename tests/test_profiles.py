@@ -0,0 +1,33 @@
+import sqlite3
+from array import array
+
+from profiles import ProfileStore, blob_to_weights, weights_to_blob
+
+WEIGHTS = [1, 1.4, 0.1 + 0.2, 2.2000000000000006, 1e-7, 123456.789]
+
+
+def test_blob_round_trip_is_exact():
+    assert blob_to_weights(weights_to_blob(WEIGHTS)) == WEIGHTS
+
+
+def test_saved_weights_load_unchanged(tmp_path):
+    path = str(tmp_path / "learners.db")
+    store = ProfileStore(path)
+    store.save("learner", "cafe", list(WEIGHTS))
+    store.close()
+    store = ProfileStore(path)
+    assert store.load("learner", "cafe") == WEIGHTS
+    store.close()
+
+
+def test_float32_database_is_upgraded(tmp_path):
+    path = str(tmp_path / "learners.db")
+    ProfileStore(path).close()
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA user_version = 0")
+    connection.execute("INSERT INTO profiles VALUES (?, ?, ?)", ("learner", "cafe", array("f", [1.5, 2.25]).tobytes()))
+    connection.commit()
+    connection.close()
+    store = ProfileStore(path)
+    assert store.load("learner", "cafe") == [1.5, 2.25]
+    store.close()
@@ -0,0 +1,58 @@
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+from PyQt5.QtCore import QCoreApplication
+
+from threads import TaskExecutor
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QCoreApplication.instance() or QCoreApplication([])
+
+
+@pytest.fixture
+def executor(app):
+    executor = TaskExecutor("test", workers=1)
+    yield executor
+    executor.shutdown()
+
+
+def process_events(app, seconds: float = 0.2):
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def test_rewatching_shared_future_calls_only_latest_watch_once(app, executor):
+    # a future shared with other callers, as the prefetcher returns
+    shared = Future()
+    calls = []
+    executor.watch(shared, lambda f: calls.append("first"), tag="audio")
+    assert executor.cancel("audio") == 1
+    executor.watch(shared, lambda f: calls.append("second"), tag="audio")
+    threading.Thread(target=shared.set_result, args=(True,)).start()
+    process_events(app)
+    assert calls == ["second"]
+    assert not shared.cancelled()
+
+
+def test_cancelled_watch_isnt_called_and_shared_future_isnt_cancelled(app, executor):
+    shared = Future()
+    calls = []
+    executor.watch(shared, lambda f: calls.append(f.result()), tag="audio")
+    executor.cancel("audio")
+    shared.set_result(1)
+    process_events(app)
+    assert calls == []
+    assert not hasattr(shared, "stale")
+
+
+def test_submitted_task_delivers_result(app, executor):
+    results = []
+    executor.submit(lambda x: x * 2, 21, on_done=lambda f: results.append(f.result()))
+    process_events(app, 0.5)
+    assert results == [42]
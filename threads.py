@@ -1,4 +1,12 @@
-from PyQt5.QtCore import QRunnable
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional, Set
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
 
 class Worker(QRunnable):
 
@@ -16,4 +24,210 @@ class Worker(QRunnable):
         """
         run function on seperate thread from parent
         """
-        self.func(*self.args, *self.kwargs)
+        self.func(*self.args, **self.kwargs)
+
+
+class TaskHandle:
+    """
+    One submit or watch of a future, a future shared by several watches,
+    e.g. one from the prefetcher, gets a handle for each so cancelling
+    one watch doesn't affect the others
+    """
+
+    def __init__(self, future: Future, tag: Hashable, on_done: Optional[Callable[[Future], None]], owned: bool):
+        self.future = future
+        self.tag = tag
+        self.on_done = on_done
+        # futures from other pools may be shared, so only owned futures are cancelled
+        self.owned = owned
+        # set when the watch is cancelled, on_done isn't called after that
+        self.stale = False
+
+
+class TaskSignals(QObject):
+    """
+    Carries finished futures from worker threads to the thread the executor was created on
+    """
+    finished = pyqtSignal(object, object)
+
+    def __init__(self):
+        QObject.__init__(self)
+        self.finished.connect(self.deliver)
+
+    def deliver(self, handle: TaskHandle, future: Future):
+        if handle.on_done is not None and not handle.stale:
+            handle.on_done(future)
+
+
+class TaskStats:
+    """
+    Counts and timings of an executor's tasks
+    """
+
+    def __init__(self, samples: int = 100):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        # seconds tasks waited in the queue and ran for, most recent tasks
+        self.waits = deque(maxlen=samples)
+        self.runs = deque(maxlen=samples)
+
+    @staticmethod
+    def percentile(samples: deque, fraction: float) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    def __str__(self) -> str:
+        return (f"{self.submitted} submitted, {self.completed} completed, {self.failed} failed, "
+                f"{self.cancelled} cancelled, {self.rejected} rejected, "
+                f"wait p50 {1000 * self.percentile(self.waits, 0.5):.1f} ms "
+                f"p90 {1000 * self.percentile(self.waits, 0.9):.1f} ms, "
+                f"run p50 {1000 * self.percentile(self.runs, 0.5):.1f} ms "
+                f"p90 {1000 * self.percentile(self.runs, 0.9):.1f} ms")
+
+
+class TaskExecutor:
+    """
+    Runs functions on a pool of threads and returns futures. Create it on the gui
+    thread, on_done callbacks are called on that thread with the finished future,
+    so they may update widgets. Tasks are tagged so work that has gone stale,
+    e.g. audio for a phrase that was skipped, can be cancelled: tasks still queued
+    don't run and the callbacks of tasks already running aren't called.
+    At most max_queue tasks wait for a thread, submitting more blocks or raises
+    queue.Full so producers can't run away from the workers.
+    """
+
+    def __init__(self, name: str, workers: int = 2, max_queue: int = 32):
+        """
+        Parameters
+        ----------
+        name: prefix of the names of the threads
+        workers: number of threads
+        max_queue: number of tasks that may wait for a thread
+        """
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self.slots = threading.BoundedSemaphore(workers + max_queue)
+        self.signals = TaskSignals()
+        self.lock = threading.Lock()
+        # tag -> handles of the tag's submits and watches that haven't finished
+        self.tagged: Dict[Hashable, Set[TaskHandle]] = {}
+        self.queued = 0
+        self.running = 0
+        self.stats = TaskStats()
+
+    def submit(self,
+               func: Callable,
+               *args,
+               tag: Hashable = None,
+               on_done: Callable[[Future], None] = None,
+               block: bool = True,
+               timeout: float = None,
+               **kwargs) -> Future:
+        """
+        Runs func(*args, **kwargs) on a worker thread
+        Parameters
+        ----------
+        func: function to run
+        tag: tag to cancel the task by
+        on_done: called with the future once it has finished, on the thread the executor was created on
+        block: if the queue is full wait for space, otherwise raise queue.Full
+        timeout: most seconds to wait for space before raising queue.Full
+
+        Returns
+        -------
+        future of the result of func
+        """
+        if not self.slots.acquire(blocking=block, timeout=timeout if block else None):
+            with self.lock:
+                self.stats.rejected += 1
+            raise queue.Full(f"{self.name} has {self.queued} tasks waiting")
+        submitted = time.perf_counter()
+
+        def run():
+            started = time.perf_counter()
+            with self.lock:
+                self.queued -= 1
+                self.running += 1
+                self.stats.waits.append(started - submitted)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.running -= 1
+                    self.stats.runs.append(time.perf_counter() - started)
+
+        with self.lock:
+            self.queued += 1
+            self.stats.submitted += 1
+        future = self.executor.submit(run)
+        self.track(future, tag, on_done, release=True)
+        return future
+
+    def watch(self, future: Future, on_done: Callable[[Future], None], tag: Hashable = None) -> Future:
+        """
+        calls on_done on the executor's thread once future, e.g. from another pool, has finished
+        """
+        self.track(future, tag, on_done, release=False)
+        return future
+
+    def track(self, future: Future, tag: Hashable, on_done: Optional[Callable], release: bool):
+        handle = TaskHandle(future, tag, on_done, owned=release)
+        if tag is not None:
+            with self.lock:
+                self.tagged.setdefault(tag, set()).add(handle)
+
+        def finished(f: Future):
+            with self.lock:
+                if tag is not None:
+                    handles = self.tagged.get(tag)
+                    if handles is not None:
+                        handles.discard(handle)
+                        if not handles:
+                            del self.tagged[tag]
+                if release:
+                    if f.cancelled():
+                        self.stats.cancelled += 1
+                        self.queued -= 1
+                    elif f.exception() is not None:
+                        self.stats.failed += 1
+                    else:
+                        self.stats.completed += 1
+            if release:
+                self.slots.release()
+            if on_done is not None and not f.cancelled():
+                self.signals.finished.emit(handle, f)
+
+        future.add_done_callback(finished)
+
+    def cancel(self, tag: Hashable) -> int:
+        """
+        Cancels the tasks tagged tag, queued ones don't run and the on_done of
+        running ones, and of watched futures, isn't called, returns the number
+        of tasks cancelled
+        """
+        with self.lock:
+            handles = list(self.tagged.pop(tag, ()))
+        for handle in handles:
+            handle.stale = True
+            if handle.owned:
+                handle.future.cancel()
+        return len(handles)
+
+    def depth(self) -> int:
+        """
+        returns number of tasks waiting for a thread
+        """
+        with self.lock:
+            return self.queued
+
+    def report(self) -> str:
+        with self.lock:
+            return f"{self.name}: {self.queued} queued, {self.running} running, {self.stats}"
+
+    def shutdown(self, wait: bool = True):
+        self.executor.shutdown(wait=wait, cancel_futures=True)
@@ -0,0 +1,178 @@
+import threading
+import time
+
+
+class TTSBackend:
+    """
+    Synthesises speech for a phrase into an audio file,
+    subclasses implement synthesize
+    """
+    name = None
+    # file extension of the audio the backend writes
+    extension = "mp3"
+    # backend specific voice, None for the backend's default
+    voice = None
+
+    def synthesize(self, phrase: str, path: str, lang: str) -> bool:
+        """
+        Writes audio of phrase to path
+        Parameters
+        ----------
+        phrase: text to speak
+        path: filepath to write the audio to
+        lang: language code of phrase e.g. "sv"
+
+        Returns
+        -------
+        True if the audio was written
+        """
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """
+    Downloads audio from the google translate text to speech api
+    """
+    name = "gtts"
+
+    def __init__(self, voice: str = None):
+        """
+        Parameters
+        ----------
+        voice: top level domain of the google translate host, which sets the accent, e.g. "com.au"
+        """
+        self.voice = voice
+
+    def synthesize(self, phrase: str, path: str, lang: str) -> bool:
+        import gtts
+        from gtts.tts import gTTSError
+
+        try:
+            tts = gtts.gTTS(phrase, lang=lang, tld=self.voice or "com")
+        except AssertionError as e:
+            print(f"{str(e)} for '{phrase}'")
+            return False
+        try:
+            tts.save(path)
+        except gTTSError as e:
+            print(e)
+            return False
+        return True
+
+
+class Pyttsx3Backend(TTSBackend):
+    """
+    Synthesises audio offline with the speech engine of the operating system
+    """
+    name = "pyttsx3"
+    extension = "wav"
+
+    def __init__(self, voice: str = None):
+        """
+        Parameters
+        ----------
+        voice: id of the voice to use, the first voice speaking the phrase's language if not given
+        """
+        import pyttsx3
+
+        self.voice = voice
+        self.engine = pyttsx3.init()
+        self.voices = self.engine.getProperty("voices")
+        # the engine can only run one utterance at a time
+        self.lock = threading.Lock()
+
+    def find_voice(self, lang: str):
+        """
+        returns id of first voice speaking lang, None if there isn't one
+        """
+        for voice in self.voices:
+            languages = [l.decode("utf-8", "ignore") if isinstance(l, bytes) else str(l) for l in voice.languages]
+            if any(lang in l for l in languages) or lang in voice.id.lower():
+                return voice.id
+        return None
+
+    def synthesize(self, phrase: str, path: str, lang: str) -> bool:
+        voice = self.voice or self.find_voice(lang)
+        if voice is None:
+            print(f"no {lang} voice installed for pyttsx3")
+            return False
+        with self.lock:
+            self.engine.setProperty("voice", voice)
+            self.engine.save_to_file(phrase, path)
+            self.engine.runAndWait()
+        return True
+
+
+class RateLimitedBackend(TTSBackend):
+    """
+    Wraps a backend so it is called at most rate times per second across all threads
+    """
+
+    def __init__(self, backend: TTSBackend, rate: float):
+        self.backend = backend
+        self.name = backend.name
+        self.extension = backend.extension
+        self.voice = backend.voice
+        self.interval = 1 / rate
+        self.next_call = time.monotonic()
+        self.lock = threading.Lock()
+
+    def synthesize(self, phrase: str, path: str, lang: str) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_call - now
+            self.next_call = max(now, self.next_call) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+        return self.backend.synthesize(phrase, path, lang)
+
+
+class FakeBackend(TTSBackend):
+    """
+    Local stand in for a real backend, writes the phrase itself as the
+    audio file, optionally after a delay to imitate a slow service
+    """
+    name = "fake"
+
+    def __init__(self, delay: float = 0.0, voice: str = None):
+        self.delay = delay
+        self.voice = voice
+        self.calls = 0
+
+    def synthesize(self, phrase: str, path: str, lang: str) -> bool:
+        self.calls += 1
+        time.sleep(self.delay)
+        with open(path, "wb") as f:
+            f.write(f"{lang}:{phrase}".encode("utf-8"))
+        return True
+
+
+BACKENDS = {backend.name: backend for backend in [GTTSBackend, Pyttsx3Backend, FakeBackend]}
+
+
+def get_backend(name: str, **kwargs) -> TTSBackend:
+    """
+    returns instance of the backend called name
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"unknown text to speech backend {name}, choose from {list(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
+
+
+def configured_backend(config, name: str = None) -> TTSBackend:
+    """
+    returns the backend set under "tts" "backend" in the config, or called name,
+    with the voice set under "tts" "voice"
+    """
+    tts = config.params.get("tts", {})
+    kwargs = {"voice": tts["voice"]} if tts.get("voice") else {}
+    return get_backend(name or tts.get("backend", "gtts"), **kwargs)
+
+
+def category_language(config, category: str) -> str:
+    """
+    returns language code of category, set per category under
+    "tts" "languages" in the config, otherwise the "tts" "language"
+    """
+    tts = config.params.get("tts", {})
+    return tts.get("languages", {}).get(category, tts.get("language", "sv"))
@@ -0,0 +1,106 @@
+"""
+Notices changes to config.json and the categories in the assets folder by
+polling mtimes, so content added while the app runs is picked up without a
+restart. A poll costs a stat of config.json and the assets folder plus two
+stats per category, the assets folder is only listed again when its own
+mtime changes and audio folders are never walked.
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+from phrase_journal import journal_path, phrases_path
+
+# (mtime in ns, size) of a file, None if it doesn't exist
+FileStamp = Optional[Tuple[int, int]]
+
+
+def file_stamp(path: str) -> FileStamp:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class Changes:
+    """
+    What changed between two polls
+    """
+
+    def __init__(self):
+        # categories that appeared, disappeared or whose phrases changed
+        self.added: List[str] = []
+        self.removed: List[str] = []
+        self.changed: List[str] = []
+        self.config = False
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.removed or self.changed or self.config)
+
+    def __str__(self) -> str:
+        return (f"added {self.added}, removed {self.removed}, changed {self.changed}, "
+                f"config {'changed' if self.config else 'unchanged'}")
+
+
+class AssetWatcher:
+    """
+    Polls config.json and the assets folder, a category is a folder of assets
+    with a phrases.json
+    """
+
+    def __init__(self, config_path: str):
+        self.config_path = config_path
+        self.assets = "assets"
+        self.config_stamp = file_stamp(config_path)
+        self.assets_stamp = None
+        self.folders: List[str] = []
+        # category -> (phrases.json stamp, journal stamp)
+        self.categories: Dict[str, Tuple[FileStamp, FileStamp]] = {}
+        self.list_folders()
+        for category in self.folders:
+            stamps = self.category_stamps(category)
+            if stamps[0] is not None:
+                self.categories[category] = stamps
+
+    def list_folders(self) -> bool:
+        """
+        lists the assets folder again if it has changed, returns True if it was listed
+        """
+        stamp = file_stamp(self.assets)
+        if stamp == self.assets_stamp:
+            return False
+        self.assets_stamp = stamp
+        self.folders = []
+        if stamp is not None:
+            with os.scandir(self.assets) as entries:
+                self.folders = sorted(entry.name for entry in entries if entry.is_dir())
+        return True
+
+    def category_stamps(self, category: str) -> Tuple[FileStamp, FileStamp]:
+        return file_stamp(phrases_path(category)), file_stamp(journal_path(category))
+
+    def poll(self) -> Changes:
+        """
+        returns what has changed since the last poll
+        """
+        changes = Changes()
+        config_stamp = file_stamp(self.config_path)
+        if config_stamp != self.config_stamp:
+            self.config_stamp = config_stamp
+            changes.config = True
+
+        self.list_folders()
+        categories = {}
+        # a folder without phrases.json yet, e.g. one being created, isn't a category
+        for category in self.folders:
+            stamps = self.category_stamps(category)
+            if stamps[0] is None:
+                continue
+            categories[category] = stamps
+            if category not in self.categories:
+                changes.added.append(category)
+            elif stamps != self.categories[category]:
+                changes.changed.append(category)
+        changes.removed = [c for c in self.categories if c not in categories]
+        self.categories = categories
+        return changes